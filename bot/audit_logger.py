@@ -9,22 +9,70 @@ into CloudWatch, ELK, Datadog, etc.
 
 Design:
   - Directory creation is lazy (first write), never at import time.
+  - The log file is opened once with O_APPEND and the descriptor is kept
+    for the lifetime of the logger.
+  - Inside the event loop, log() only serializes the event and puts it on
+    a queue; a background writer thread drains the queue and writes each
+    burst with one writev(2) and one fsync(2), so disk latency never stalls
+    the loop and a burst of events costs a single flush to disk.
+    Outside a loop (scripts, shutdown) events are written inline.
+  - Once the log passes _ROTATE_BYTES it is renamed to '<path>.1', older
+    generations shift to '.2', '.3', ... and a fresh file is started.
+    Every generation is kept unless AUDIT_LOG_BACKUPS caps the count; the
+    oldest generation beyond it is then deleted with a warning.
   - Core event fields are written AFTER metadata expansion so metadata
     can never silently overwrite timestamp, user_id, or action (fix #11).
 """
 
-import json
+import asyncio
+import atexit
+import errno
+import itertools
 import logging
-from datetime import datetime, timezone
+import mmap
+import os
+import queue
+import threading
+import time
+from contextlib import closing
 from pathlib import Path
+from typing import BinaryIO, Generator, Optional, Sequence
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Size at which the audit log is rotated to '<path>.1'.
+_ROTATE_BYTES = 8 * 1024 * 1024
+
+_NEWLINE = b"\n"
+
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
 
 class AuditLogger:
-    def __init__(self, log_path: str = None):
+    def __init__(
+        self,
+        log_path: str = None,
+        max_bytes: int = _ROTATE_BYTES,
+        backups: Optional[int] = None,
+    ):
         from config import Config
         self.log_path = log_path or Config.audit_log_path()
+        self.max_bytes = max_bytes
+        # Rotated generations to keep; 0 keeps all of them.
+        self.backups = Config.audit_log_backups() if backups is None else backups
+        self._fd: Optional[int] = None
+        self._size = 0
+        self._write_lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        atexit.register(self.close)
 
     def _ensure_log_dir(self):
         try:
@@ -32,6 +80,133 @@ class AuditLogger:
         except OSError as e:
             logger.error("Cannot create audit log directory: %s", e)
 
+    def _get_fd(self) -> int:
+        """Return the append-only descriptor, opening it on first use."""
+        if self._fd is None:
+            self._ensure_log_dir()
+            self._fd = os.open(
+                self.log_path,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC,
+                0o640,
+            )
+            self._size = os.fstat(self._fd).st_size
+        return self._fd
+
+    def _write(self, iov: Sequence[bytes]) -> None:
+        """Append iov to the log, reopening once if the descriptor went stale."""
+        with self._write_lock:
+            self._write_unlocked(iov)
+            self._maybe_rotate()
+
+    def _write_unlocked(self, iov: Sequence[bytes]) -> None:
+        try:
+            written = _writev(self._get_fd(), iov)
+        except OSError as e:
+            if e.errno != errno.EBADF:
+                raise
+            self._fd = None
+            written = _writev(self._get_fd(), iov)
+        self._size += written
+
+    def _maybe_rotate(self) -> None:
+        """Move a full log to '<path>.1'; the next write opens a fresh file."""
+        if self._size <= self.max_bytes:
+            return
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+        self._fd = None
+        self._size = 0
+        try:
+            self._shift_generations()
+            os.replace(self.log_path, self.log_path + ".1")
+        except OSError as e:
+            logger.error("Failed to rotate audit log: %s", e)
+
+    def _shift_generations(self) -> None:
+        """Rename '<path>.N' to '<path>.N+1', oldest first, freeing '.1'."""
+        top = 1
+        while os.path.exists(f"{self.log_path}.{top}"):
+            top += 1
+        # Generations 1..top-1 exist; drop any the retention setting excludes.
+        while self.backups and top > self.backups:
+            top -= 1
+            oldest = f"{self.log_path}.{top}"
+            logger.warning("Deleting audit log generation %s (AUDIT_LOG_BACKUPS=%d)",
+                           oldest, self.backups)
+            os.remove(oldest)
+        for n in range(top - 1, 0, -1):
+            os.replace(f"{self.log_path}.{n}", f"{self.log_path}.{n + 1}")
+
+    def _write_logged(self, iov: Sequence[bytes]) -> None:
+        try:
+            self._write(iov)
+        except OSError as e:
+            logger.error("Failed to write audit log: %s", e)
+
+    def _write_batch(self, iov: Sequence[bytes]) -> None:
+        """Append a batch and fsync it once, so a burst costs one disk flush."""
+        with self._write_lock:
+            try:
+                self._write_unlocked(iov)
+                os.fsync(self._fd)
+                self._maybe_rotate()
+            except OSError as e:
+                logger.error("Failed to write audit log: %s", e)
+
+    def _writer_loop(self) -> None:
+        """
+        Background writer: block for one item, then drain everything else
+        already queued and write it as a single batch. threading.Event items
+        are flush requests, released once the batch before them is on disk.
+        """
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            iov = []
+            for item in items:
+                if not isinstance(item, threading.Event):
+                    iov += (item, _NEWLINE)
+            if iov:
+                self._write_batch(iov)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _enqueue(self, payload: bytes) -> None:
+        """Hand a serialized event to the writer thread, starting it on first use."""
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="audit-writer", daemon=True
+            )
+            self._writer.start()
+        self._queue.put(payload)
+
+    def flush_sync(self) -> None:
+        """Block until everything queued so far has been written."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        """Flush and close the log descriptor. Safe to call more than once."""
+        self.flush_sync()
+        with self._write_lock:
+            if self._fd is None:
+                return
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
     def log(self, user: dict, action: str, metadata: dict) -> None:
         """
         Write a structured audit event.
@@ -44,44 +219,130 @@ class AuditLogger:
             action:   e.g. "deploy_started", "rollback_completed"
             metadata: arbitrary context, e.g. {"env": "production", "commit": "abc123"}
         """
-        # Fix #11: core fields overwrite any conflicting metadata keys.
         event = {
-            **metadata,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _utc_timestamp(),
             "user_id": user.get("id"),
             "username": user.get("username"),
             "full_name": user.get("full_name"),
             "action": action,
         }
+        # Fix #11: core fields overwrite any conflicting metadata keys.
+        record = {**metadata, **event} if metadata else event
 
-        logger.info("AUDIT: %s", json.dumps(event))
+        # Serialize once; orjson returns compact UTF-8 bytes that go straight
+        # to the log descriptor (the newline is a separate iovec, so the
+        # payload is never copied), and the same payload feeds the app logger.
+        try:
+            payload = orjson.dumps(record, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. ints wider than 64 bits: an audit call must never crash
+            # the handler, so keep the core fields and a repr of the rest.
+            payload = orjson.dumps({**event, "metadata_repr": repr(metadata)})
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("AUDIT: %s", payload.decode())
 
-        self._ensure_log_dir()
         try:
-            with open(self.log_path, "a") as f:
-                f.write(json.dumps(event) + "\n")
-        except OSError as e:
-            logger.error("Failed to write audit log: %s", e)
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to protect: write inline, after anything queued.
+            self.flush_sync()
+            self._write_logged((payload, _NEWLINE))
+        else:
+            self._enqueue(payload)
 
-    def get_recent(self, limit: int = 20) -> list:
+    async def get_recent(self, limit: int = 20) -> list:
         """
         Return the last N audit events.
         Corrupt lines are skipped individually — one bad line never loses all events.
+
+        The file is memory-mapped and walked backwards from EOF, and parsing
+        stops once N events are collected, so only the pages holding those
+        events are touched. If the current file holds fewer than
+        N events the rotated '<path>.1', '<path>.2', ... are read next.
+
+        Waiting for queued events and reading the file both block, so they
+        run in a worker thread rather than on the event loop.
         """
-        try:
-            with open(self.log_path) as f:
-                lines = f.readlines()
-        except FileNotFoundError:
+        if limit <= 0:
             return []
+        return await asyncio.to_thread(self._read_recent, limit)
+
+    def _read_recent(self, limit: int) -> list:
+        self.flush_sync()
 
         events = []
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for generation in itertools.count():
+            path = f"{self.log_path}.{generation}" if generation else self.log_path
             try:
-                events.append(json.loads(line))
-            except json.JSONDecodeError:
-                logger.warning("Skipping corrupt audit log line: %r", line[:120])
+                with open(path, "rb") as f, closing(_read_lines_reversed(f)) as lines:
+                    for line in lines:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            events.append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            logger.warning("Skipping corrupt audit log line: %r", line[:120])
+                            continue
+                        if len(events) >= limit:
+                            break
+            except FileNotFoundError:
+                if generation:
+                    break  # generations are contiguous; this was the oldest
+                continue
+            if len(events) >= limit:
+                break
+
+        events.reverse()
+        return events
+
+
+if hasattr(os, "writev"):
+    def _writev(fd: int, iov: Sequence[bytes]) -> int:
+        """Gather-write iov, in IOV_MAX-sized slices; returns bytes written."""
+        if len(iov) <= _IOV_MAX:
+            return os.writev(fd, iov)
+        return sum(
+            os.writev(fd, iov[i:i + _IOV_MAX]) for i in range(0, len(iov), _IOV_MAX)
+        )
+else:  # Windows has no writev(2)
+    def _writev(fd: int, iov: Sequence[bytes]) -> int:
+        return os.write(fd, b"".join(iov))
+
+
+_second_prefix: tuple = (-1, "")
+
+
+def _utc_timestamp() -> str:
+    """
+    ISO-8601 UTC timestamp with microseconds, e.g. 2024-01-01T12:00:00.123456+00:00.
+    Same format as datetime.isoformat(). The 'YYYY-MM-DDTHH:MM:SS' prefix is
+    formatted once per second and reused by every event within that second;
+    only the microsecond suffix is built per call.
+    """
+    global _second_prefix
+    now = time.time()
+    sec = int(now)
+    cached_sec, prefix = _second_prefix
+    if cached_sec != sec:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+        _second_prefix = (sec, prefix)
+    return f"{prefix}.{int((now - sec) * 1_000_000):06d}+00:00"
+
 
-        return events[-limit:]
+def _read_lines_reversed(f: BinaryIO) -> Generator[bytes, None, None]:
+    """
+    Yield the lines of a binary file last-to-first. The file is mapped
+    read-only and scanned with rfind(), so only the returned lines are
+    copied out of the page cache.
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file: nothing to map
+        return
+    with mm:
+        end = len(mm)
+        while end >= 0:
+            start = mm.rfind(b"\n", 0, end) + 1
+            yield mm[start:end]
+            end = start - 1
@@ -9,18 +9,27 @@ Architecture:
 """
 
 import asyncio
+import contextlib
+import io
 import logging
-from datetime import datetime, timezone
+import logging.handlers
+import queue
+import secrets
+import sys
+import time
 from typing import Optional
+from urllib.parse import urlsplit
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     CallbackQueryHandler,
     ContextTypes,
 )
 from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
 
 from config import Config
 from rbac import require_role, Role
@@ -36,6 +45,88 @@ logger = logging.getLogger(__name__)
 audit = AuditLogger()
 deploy_manager = DeploymentManager()
 
+# Translation table for _escape_html — one C-level pass instead of three replaces.
+_HTML_TT = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Shared by every production confirmation; only the Confirm button varies.
+_CANCEL_BTN = InlineKeyboardButton("❌ Cancel", callback_data="deploy:cancel")
+
+# Static message bodies, built once at import.
+_HELP_BODY_USER = (
+    "<b>Available Commands:</b>\n"
+    "<code>/deploy staging</code> — Deploy to staging\n"
+    "<code>/status</code> — Check environment status\n"
+)
+_HELP_BODY_ADMIN = _HELP_BODY_USER + (
+    "<code>/deploy production</code> — Deploy to production (requires confirmation)\n"
+    "<code>/rollback staging</code> — Rollback staging\n"
+    "<code>/rollback production</code> — Rollback production\n"
+)
+_HELP_TEXT_USER = (
+    "🤖 <b>Deployment Bot</b> — Role: <code>Staging User</code>\n\n" + _HELP_BODY_USER
+)
+_HELP_TEXT_ADMIN = (
+    "🤖 <b>Deployment Bot</b> — Role: <code>Admin</code>\n\n" + _HELP_BODY_ADMIN
+)
+_STATUS_HEADER = "📊 <b>Deployment Status</b>\n"
+
+# Deploy-flow message templates; call sites only fill in the escaped values.
+_CONFIRM_TMPL = (
+    "⚠️ <b>Production Deployment Confirmation</b>\n\n"
+    "👤 Initiated by: @{user}\n"
+    "🌿 Branch: <code>{branch}</code>\n"
+    "🔖 Commit: <code>{commit}</code>\n"
+    "🕐 Time: {ts} UTC\n\n"
+    "Are you sure you want to deploy to <b>PRODUCTION</b>?"
+)
+_DEPLOY_STARTED_TMPL = (
+    "🚀 <b>Deployment Started</b>\n\n"
+    "🌍 Environment: <code>{env}</code>\n"
+    "🔖 Commit: <code>{commit}</code>\n"
+    "👤 By: @{user}\n"
+    "🕐 {ts} UTC"
+)
+_DEPLOY_SUCCESS_TMPL = (
+    "✅ <b>Deployment to {env} succeeded!</b>\n"
+    "🔖 Commit: <code>{commit}</code>"
+)
+_DEPLOY_FAILED_TMPL = (
+    "❌ <b>Deployment to {env} FAILED!</b>\n"
+    "🔖 Commit: <code>{commit}</code>\n"
+    "⏪ Initiating automatic rollback..."
+)
+
+# Remaining templated replies. Call sites fill every {placeholder} with an
+# _escape_html()'d value.
+_ROLLBACK_STARTED_TMPL = "⏪ Initiating rollback for <b>{env}</b>..."
+_ROLLBACK_DONE_TMPL = "✅ Rollback for <b>{env}</b> complete."
+_ROLLBACK_FAILED_TMPL = "❌ Rollback for <b>{env}</b> FAILED. Check logs above."
+_DEPLOYING_TMPL = "🚀 Deploying to <b>{env}</b>..."
+_IN_PROGRESS_TMPL = (
+    "⏳ A deployment to <b>{env}</b> is already in progress. Please wait for it to finish."
+)
+_ALREADY_RUNNING_TMPL = "⏳ A deployment to <b>{env}</b> is already running."
+_STATUS_ENV_TMPL = (
+    "{emoji} <b>{env}</b>\n"
+    "  • Commit: <code>{commit}</code>\n"
+    "  • Deployed: {deployed_at}\n"
+    "  • Health: {health_url}\n"
+)
+
+# _stream_to_chat flushes once this many characters are buffered (kept under
+# the 4000-char send_chunked slice, so one flush is usually one message)
+# or once this many seconds have passed since the last flush.
+_FLUSH_CHARS = 3800
+_FLUSH_INTERVAL = 1.5
+
+# Sentinel prefixes DeploymentManager puts on failure lines. Matched with a
+# single C-level str.startswith(tuple) per streamed line.
+_ERROR_PREFIXES = ("ERROR:", "ERROR during")
+
+# Production confirm buttons carry only an opaque one-time token; what it
+# authorizes lives server-side in bot_data and expires after this many seconds.
+_PENDING_DEPLOY_TTL = 300
+
 # Fix #5: in-flight deploy lock — prevents double-deploy from a double-tap
 # or a replayed callback. Maps environment → True while a deploy is running.
 _deploying: set[str] = set()
@@ -60,25 +151,108 @@ def get_user_info(update: Update) -> dict:
     }
 
 
+_now_str_cache: tuple[int, str] = (-1, "")
+
+
+def _utc_now_str() -> str:
+    """
+    Current UTC time as 'YYYY-MM-DD HH:MM:SS' for human-facing messages.
+    The string only changes once a second, so it is formatted at most once
+    per second and reused by every message sent within that second.
+    """
+    global _now_str_cache
+    now = int(time.time())
+    if _now_str_cache[0] != now:
+        _now_str_cache = (now, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now)))
+    return _now_str_cache[1]
+
+
 def _escape_html(text: str) -> str:
     """Escape characters that are special in Telegram HTML mode."""
-    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text.translate(_HTML_TT)
+
+
+def _issue_deploy_token(
+    context: ContextTypes.DEFAULT_TYPE, user_id: int, environment: str, commit: str
+) -> str:
+    """
+    Record a pending confirmation in bot_data and return its one-time token.
+    Expired entries are swept here, so the store never outgrows the number of
+    confirmations issued within one TTL window.
+    """
+    pending = context.bot_data.setdefault("pending_deploys", {})
+    now = time.monotonic()
+    for stale in [t for t, p in pending.items() if p["exp"] < now]:
+        del pending[stale]
+    token = secrets.token_urlsafe(12)
+    pending[token] = {
+        "user": user_id,
+        "env": environment,
+        "commit": commit,
+        "exp": now + _PENDING_DEPLOY_TTL,
+    }
+    return token
+
+
+def _deploy_token_owner(context: ContextTypes.DEFAULT_TYPE, token: str) -> Optional[int]:
+    """User id a pending confirmation was issued to, or None if there is none."""
+    entry = context.bot_data.get("pending_deploys", {}).get(token)
+    return entry["user"] if entry is not None else None
+
+
+def _claim_deploy_token(
+    context: ContextTypes.DEFAULT_TYPE, token: str, user_id: int
+) -> Optional[dict]:
+    """
+    Consume a pending confirmation. Returns None if the token is unknown,
+    expired, or was issued to a different user (in which case it is left
+    in place for its owner).
+    """
+    pending = context.bot_data.get("pending_deploys", {})
+    entry = pending.get(token)
+    if entry is None or entry["user"] != user_id:
+        return None
+    del pending[token]
+    if entry["exp"] < time.monotonic():
+        return None
+    return entry
 
 
 async def send_chunked(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str) -> None:
     """
     Send long messages in Telegram-safe 4096-char chunks using HTML mode.
     Content is HTML-escaped so raw shell output never breaks markup.
+
+    The text is escaped once up front and the escaped string is sliced, so
+    chunk size accounts for entity expansion and a cut never lands inside
+    an entity such as &amp;.
+
+    Chunks are sent sequentially: Telegram does not guarantee ordering of
+    concurrent sends to one chat, and log output must stay in order.
+    Throttling is left to the Application's AIORateLimiter (see main()).
+    Most flushed batches fit in one message and skip the split loop entirely.
     """
     chunk_size = 4000
-    for i in range(0, len(text), chunk_size):
-        chunk = _escape_html(text[i: i + chunk_size])
+    escaped = _escape_html(text)
+    if len(escaped) <= chunk_size:
+        await context.bot.send_message(
+            chat_id=chat_id, text=f"<pre>{escaped}</pre>", parse_mode=ParseMode.HTML
+        )
+        return
+    start = 0
+    while start < len(escaped):
+        end = start + chunk_size
+        if end < len(escaped):
+            # Entities are at most 5 chars; back up to an '&' near the cut.
+            amp = escaped.rfind("&", end - 4, end)
+            if amp > start:
+                end = amp
         await context.bot.send_message(
             chat_id=chat_id,
-            text=f"<pre>{chunk}</pre>",
+            text=f"<pre>{escaped[start:end]}</pre>",
             parse_mode=ParseMode.HTML,
         )
-        await asyncio.sleep(0.3)  # stay within Telegram rate limits
+        start = end
 
 
 def _is_error_line(line: str) -> bool:
@@ -87,7 +261,7 @@ def _is_error_line(line: str) -> bool:
     Uses a specific prefix to avoid false-positives on normal log lines that
     happen to contain the word "error".
     """
-    return line.startswith("ERROR:") or line.startswith("ERROR during")
+    return line.startswith(_ERROR_PREFIXES)
 
 
 async def _stream_to_chat(
@@ -99,30 +273,67 @@ async def _stream_to_chat(
     Consume an async generator of log lines, send them to Telegram in batches,
     and return (success, all_lines).
 
-    Fix #19: buffer flushes both on count (10 lines) AND on time (every 2s),
-    so the user sees progress even if a deploy script goes quiet mid-run.
+    Fix #19: buffer flushes both on size AND on time, so the user sees
+    progress even if a deploy script goes quiet mid-run. A batch is sent
+    before it would exceed _FLUSH_CHARS (one Telegram message), and any
+    buffered lines are sent once _FLUSH_INTERVAL elapses — even while the
+    generator is still waiting for its next line.
+
+    The generator is consumed with a plain `async for` in this task; the
+    time-based flush runs in a separate timer task, so no per-line task is
+    created. The deploy timeout (fix #17) is enforced inside the generator
+    and surfaces as an ERROR line, never as a cancellation of this task.
     """
     success = True
-    log_buffer: list[str] = []
+    log_buffer = io.StringIO()
+    buffered_chars = 0
     all_lines: list[str] = []
-    last_flush = asyncio.get_event_loop().time()
+    loop = asyncio.get_running_loop()
+    last_flush = loop.time()
+    # Serializes sends from both tasks so batches arrive in order.
+    flush_lock = asyncio.Lock()
 
     async def flush():
-        nonlocal log_buffer, last_flush
-        if log_buffer:
-            await send_chunked(context, chat_id, "\n".join(log_buffer))
-            log_buffer = []
-            last_flush = asyncio.get_event_loop().time()
-
-    async for line in generator:
-        all_lines.append(line)
-        log_buffer.append(line)
-        if _is_error_line(line):
-            success = False
-
-        now = asyncio.get_event_loop().time()
-        if len(log_buffer) >= 10 or (now - last_flush) >= 2.0:
-            await flush()
+        nonlocal log_buffer, buffered_chars, last_flush
+        async with flush_lock:
+            if buffered_chars:
+                text = log_buffer.getvalue()
+                log_buffer = io.StringIO()
+                buffered_chars = 0
+                await send_chunked(context, chat_id, text[:-1])  # drop trailing "\n"
+            last_flush = loop.time()
+
+    async def flush_when_quiet():
+        while True:
+            remaining = _FLUSH_INTERVAL - (loop.time() - last_flush)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            elif buffered_chars:
+                await flush()  # generator went quiet — show what we have
+            else:
+                await asyncio.sleep(_FLUSH_INTERVAL)
+
+    timer = asyncio.create_task(flush_when_quiet())
+    try:
+        async for line in generator:
+            all_lines.append(line)
+            if _is_error_line(line):
+                success = False
+
+            if buffered_chars + len(line) + 1 > _FLUSH_CHARS:
+                await flush()
+            log_buffer.write(line)
+            log_buffer.write("\n")
+            buffered_chars += len(line) + 1
+            if loop.time() - last_flush >= _FLUSH_INTERVAL:
+                await flush()
+    finally:
+        # Stop the timer only between sends, so a batch it already took out
+        # of the buffer is never lost mid-send.
+        async with flush_lock:
+            timer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await timer
 
     await flush()  # drain any remaining lines
     return success, all_lines
@@ -165,20 +376,23 @@ async def _confirm_production_deploy(
     # calling get_current_branch(), which returns the bot container's local
     # HEAD — not the branch being deployed.
     branch = Config.github_branch_production()
-    commit_hash = deploy_manager.get_latest_commit(branch=branch)
+    commit_hash = await deploy_manager.get_latest_commit(branch=branch)
 
+    token = _issue_deploy_token(
+        context, update.effective_user.id, "production", commit_hash
+    )
     keyboard = [[
-        InlineKeyboardButton("✅ Confirm Deploy", callback_data=f"deploy:production:{commit_hash}"),
-        InlineKeyboardButton("❌ Cancel", callback_data="deploy:cancel"),
+        InlineKeyboardButton("✅ Confirm Deploy", callback_data=f"deploy:{token}"),
+        _CANCEL_BTN,
     ]]
 
     await update.message.reply_text(
-        f"⚠️ <b>Production Deployment Confirmation</b>\n\n"
-        f"👤 Initiated by: @{_escape_html(user['username'])}\n"
-        f"🌿 Branch: <code>{_escape_html(branch)}</code>\n"
-        f"🔖 Commit: <code>{_escape_html(commit_hash)}</code>\n"
-        f"🕐 Time: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC\n\n"
-        f"Are you sure you want to deploy to <b>PRODUCTION</b>?",
+        _CONFIRM_TMPL.format(
+            user=_escape_html(user["username"]),
+            branch=_escape_html(branch),
+            commit=_escape_html(commit_hash),
+            ts=_utc_now_str(),
+        ),
         parse_mode=ParseMode.HTML,
         reply_markup=InlineKeyboardMarkup(keyboard),
     )
@@ -201,7 +415,7 @@ async def cmd_rollback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     audit.log(user, "rollback_initiated", {"env": environment})
 
     await update.message.reply_text(
-        f"⏪ Initiating rollback for <b>{_escape_html(environment)}</b>...",
+        _ROLLBACK_STARTED_TMPL.format(env=_escape_html(environment)),
         parse_mode=ParseMode.HTML,
     )
 
@@ -215,14 +429,14 @@ async def cmd_rollback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         audit.log(user, "rollback_completed", {"env": environment})
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text=f"✅ Rollback for <b>{_escape_html(environment)}</b> complete.",
+            text=_ROLLBACK_DONE_TMPL.format(env=_escape_html(environment)),
             parse_mode=ParseMode.HTML,
         )
     else:
         audit.log(user, "rollback_failed", {"env": environment})
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text=f"❌ Rollback for <b>{_escape_html(environment)}</b> FAILED. Check logs above.",
+            text=_ROLLBACK_FAILED_TMPL.format(env=_escape_html(environment)),
             parse_mode=ParseMode.HTML,
         )
 
@@ -235,15 +449,16 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
     status = await deploy_manager.get_status()
 
-    lines = ["📊 <b>Deployment Status</b>\n"]
+    lines = [_STATUS_HEADER]
     for env, info in status.items():
         emoji = "🟢" if info["healthy"] else "🔴"
-        lines.append(
-            f"{emoji} <b>{_escape_html(env.upper())}</b>\n"
-            f"  • Commit: <code>{_escape_html(info['commit'])}</code>\n"
-            f"  • Deployed: {_escape_html(info['deployed_at'])}\n"
-            f"  • Health: {_escape_html(info['health_url'])}\n"
-        )
+        lines.append(_STATUS_ENV_TMPL.format(
+            emoji=emoji,
+            env=_escape_html(env.upper()),
+            commit=_escape_html(info["commit"]),
+            deployed_at=_escape_html(info["deployed_at"]),
+            health_url=_escape_html(info["health_url"]),
+        ))
 
     await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
 
@@ -258,20 +473,7 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("🚫 You are not authorized to use this bot.")
         return
 
-    role = "Admin" if is_admin else "Staging User"
-    text = (
-        f"🤖 <b>Deployment Bot</b> — Role: <code>{role}</code>\n\n"
-        f"<b>Available Commands:</b>\n"
-        f"<code>/deploy staging</code> — Deploy to staging\n"
-        f"<code>/status</code> — Check environment status\n"
-    )
-    if is_admin:
-        text += (
-            "<code>/deploy production</code> — Deploy to production (requires confirmation)\n"
-            "<code>/rollback staging</code> — Rollback staging\n"
-            "<code>/rollback production</code> — Rollback production\n"
-        )
-
+    text = _HELP_TEXT_ADMIN if is_admin else _HELP_TEXT_USER
     await update.message.reply_text(text, parse_mode=ParseMode.HTML)
 
 
@@ -280,42 +482,56 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle inline keyboard button presses."""
     query = update.callback_query
-    await query.answer()
 
     # Fix #3: guard against None user before calling get_user_info
     if update.effective_user is None:
+        await query.answer()
         return
     user = get_user_info(update)
 
-    data = query.data
-    parts = data.split(":", maxsplit=2)
-    action = parts[0]
+    # "deploy:<token>" or "deploy:cancel"
+    action, _, token = query.data.partition(":")
+
+    # A confirmation issued to another admin: tell only the presser and
+    # leave the shared message, keyboard included, for its owner.
+    owner = _deploy_token_owner(context, token) if action == "deploy" else None
+    if owner is not None and owner != update.effective_user.id:
+        await query.answer("This confirmation belongs to another admin.", show_alert=True)
+        audit.log(user, "deploy_callback_wrong_user", {"owner": owner})
+        return
+    await query.answer()
 
     if action == "deploy":
-        if len(parts) < 2 or parts[1] == "cancel":
+        if not token or token == "cancel":
             await query.edit_message_text("❌ Deployment cancelled.")
             audit.log(user, "deploy_cancelled", {})
             return
 
-        environment = parts[1]
-        commit_hash = parts[2] if len(parts) > 2 else "unknown"
-
         # Security: re-verify admin role on callback (buttons can be replayed).
         if not Config.is_admin(update.effective_user.id):
             await query.edit_message_text("🚫 You no longer have permission for this action.")
             return
 
+        # Security: callback_data is client-supplied — it only names a
+        # server-side pending confirmation, which also fixes env and commit.
+        # Tokens are single-use, so a replayed or double-tapped button fails.
+        pending = _claim_deploy_token(context, token, update.effective_user.id)
+        if pending is None:
+            await query.edit_message_text("🚫 This confirmation is no longer valid.")
+            audit.log(user, "deploy_callback_rejected", {})
+            return
+        environment, commit_hash = pending["env"], pending["commit"]
+
         # Fix #5: reject if a deploy for this environment is already in flight.
         if environment in _deploying:
             await query.edit_message_text(
-                f"⏳ A deployment to <b>{_escape_html(environment)}</b> is already in progress. "
-                f"Please wait for it to finish.",
+                _IN_PROGRESS_TMPL.format(env=_escape_html(environment)),
                 parse_mode=ParseMode.HTML,
             )
             return
 
         await query.edit_message_text(
-            f"🚀 Deploying to <b>{_escape_html(environment)}</b>...",
+            _DEPLOYING_TMPL.format(env=_escape_html(environment)),
             parse_mode=ParseMode.HTML,
         )
         await _run_deployment(update, context, environment, user, confirmed_commit=commit_hash)
@@ -340,13 +556,13 @@ async def _run_deployment(
             if environment == "production"
             else Config.github_branch_staging()
         )
-        commit = deploy_manager.get_latest_commit(branch=branch)
+        commit = await deploy_manager.get_latest_commit(branch=branch)
 
     # Fix #5: acquire the deploy lock before starting.
     if environment in _deploying:
         await context.bot.send_message(
             chat_id=chat_id,
-            text=f"⏳ A deployment to <b>{_escape_html(environment)}</b> is already running.",
+            text=_ALREADY_RUNNING_TMPL.format(env=_escape_html(environment)),
             parse_mode=ParseMode.HTML,
         )
         return
@@ -357,12 +573,11 @@ async def _run_deployment(
 
         await context.bot.send_message(
             chat_id=chat_id,
-            text=(
-                f"🚀 <b>Deployment Started</b>\n\n"
-                f"🌍 Environment: <code>{_escape_html(environment)}</code>\n"
-                f"🔖 Commit: <code>{_escape_html(commit)}</code>\n"
-                f"👤 By: @{_escape_html(user['username'])}\n"
-                f"🕐 {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC"
+            text=_DEPLOY_STARTED_TMPL.format(
+                env=_escape_html(environment),
+                commit=_escape_html(commit),
+                user=_escape_html(user["username"]),
+                ts=_utc_now_str(),
             ),
             parse_mode=ParseMode.HTML,
         )
@@ -377,9 +592,8 @@ async def _run_deployment(
             audit.log(user, "deploy_success", {"env": environment, "commit": commit})
             await context.bot.send_message(
                 chat_id=chat_id,
-                text=(
-                    f"✅ <b>Deployment to {_escape_html(environment)} succeeded!</b>\n"
-                    f"🔖 Commit: <code>{_escape_html(commit)}</code>"
+                text=_DEPLOY_SUCCESS_TMPL.format(
+                    env=_escape_html(environment), commit=_escape_html(commit)
                 ),
                 parse_mode=ParseMode.HTML,
             )
@@ -387,10 +601,8 @@ async def _run_deployment(
             audit.log(user, "deploy_failed", {"env": environment, "commit": commit})
             await context.bot.send_message(
                 chat_id=chat_id,
-                text=(
-                    f"❌ <b>Deployment to {_escape_html(environment)} FAILED!</b>\n"
-                    f"🔖 Commit: <code>{_escape_html(commit)}</code>\n"
-                    f"⏪ Initiating automatic rollback..."
+                text=_DEPLOY_FAILED_TMPL.format(
+                    env=_escape_html(environment), commit=_escape_html(commit)
                 ),
                 parse_mode=ParseMode.HTML,
             )
@@ -431,6 +643,30 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
 
 # ── Main ───────────────────────────────────────────────────────────────────────
 
+def _start_log_listener() -> logging.handlers.QueueListener:
+    """
+    Move log output off the event loop: the root logger's handlers are
+    replaced by a QueueHandler (a non-blocking put) and the original
+    handlers run on a QueueListener thread instead.
+    """
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+
+async def _on_shutdown(app: Application) -> None:
+    """Release long-lived resources once the Application has stopped."""
+    await deploy_manager.close()
+
+
 def main() -> None:
     """Initialize and start the bot."""
     Config.validate()
@@ -439,7 +675,33 @@ def main() -> None:
     if not token:
         raise ValueError("TELEGRAM_BOT_TOKEN not set in environment")
 
-    app = Application.builder().token(token).build()
+    # Bot-wide token bucket for every API call: 30 msg/s overall, 20 msg/min
+    # per group, with automatic retries when Telegram answers RetryAfter.
+    rate_limiter = AIORateLimiter(
+        overall_max_rate=30,
+        overall_time_period=1,
+        group_max_rate=20,
+        group_time_period=60,
+        max_retries=3,
+    )
+    # libuv-backed event loop for the polling, streaming and send traffic.
+    # run_polling() creates its loop from the policy, so set it beforehand.
+    if sys.platform != "win32":
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    # HTTP/2 lets concurrent API calls share one multiplexed TLS connection.
+    # getUpdates long-polls on its own client so it never holds a slot that
+    # a send_message/edit_message_text call is waiting for.
+    app = (
+        Application.builder()
+        .token(token)
+        .request(HTTPXRequest(connection_pool_size=64, pool_timeout=5.0, http_version="2"))
+        .get_updates_request(HTTPXRequest(http_version="2"))
+        .rate_limiter(rate_limiter)
+        .post_shutdown(_on_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("deploy", cmd_deploy))
     app.add_handler(CommandHandler("rollback", cmd_rollback))
@@ -449,8 +711,26 @@ def main() -> None:
     app.add_handler(CallbackQueryHandler(handle_callback))
     app.add_error_handler(error_handler)
 
-    logger.info("🤖 Deployment bot starting...")
-    app.run_polling(drop_pending_updates=True)
+    log_listener = _start_log_listener()
+    try:
+        webhook_url = Config.webhook_url()
+        if webhook_url:
+            # Telegram pushes each update as it happens; nginx forwards the
+            # webhook path to this listener (see nginx/nginx.conf).
+            logger.info("🤖 Deployment bot starting (webhook)...")
+            app.run_webhook(
+                listen="0.0.0.0",
+                port=Config.webhook_port(),
+                url_path=urlsplit(webhook_url).path.lstrip("/"),
+                webhook_url=webhook_url,
+                secret_token=Config.webhook_secret(),
+                drop_pending_updates=True,
+            )
+        else:
+            logger.info("🤖 Deployment bot starting...")
+            app.run_polling(drop_pending_updates=True)
+    finally:
+        log_listener.stop()  # flushes queued records before exit
 
 
 if __name__ == "__main__":
@@ -9,8 +9,9 @@ frozen at import time. This ensures:
   - Config.validate() and _safe_env() always see the same values
 """
 
+import functools
 import os
-from typing import Set
+from typing import FrozenSet
 
 
 class Config:
@@ -24,24 +25,39 @@ class Config:
 
     # ── RBAC ─────────────────────────────────────────────────────────────────
 
-    @classmethod
-    def _parse_ids(cls, raw: str) -> Set[int]:
-        """Parse comma-separated integer IDs, ignoring blanks/invalid."""
-        ids: Set[int] = set()
-        for part in raw.split(","):
-            part = part.strip()
-            if part.isdigit():
-                ids.add(int(part))
-        return ids
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _parse_ids(raw: str) -> FrozenSet[int]:
+        """
+        Parse comma-separated integer IDs, ignoring blanks/invalid.
+
+        Memoized on the raw env string: the env is still read on every call
+        (so changes are picked up immediately), but the CSV is only parsed
+        again when its value actually changes.
+
+        str.isdecimal() accepts exactly what int() parses (no signs, no
+        superscripts), so each token is validated and converted in one go.
+        """
+        parts = (p.strip() for p in raw.split(","))
+        return frozenset(int(p) for p in parts if p.isdecimal())
 
     @classmethod
-    def admin_ids(cls) -> Set[int]:
+    def admin_ids(cls) -> FrozenSet[int]:
         return cls._parse_ids(os.environ.get("ADMIN_TELEGRAM_IDS", ""))
 
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _merge_ids(staging_raw: str, admin_raw: str) -> FrozenSet[int]:
+        """Union of both raw ID lists, memoized so the union isn't rebuilt per call."""
+        return Config._parse_ids(staging_raw) | Config._parse_ids(admin_raw)
+
     @classmethod
-    def staging_ids(cls) -> Set[int]:
+    def staging_ids(cls) -> FrozenSet[int]:
         """Staging users PLUS all admins (admins are a superset)."""
-        return cls._parse_ids(os.environ.get("STAGING_TELEGRAM_IDS", "")) | cls.admin_ids()
+        return cls._merge_ids(
+            os.environ.get("STAGING_TELEGRAM_IDS", ""),
+            os.environ.get("ADMIN_TELEGRAM_IDS", ""),
+        )
 
     @classmethod
     def is_admin(cls, user_id: int) -> bool:
@@ -143,12 +159,32 @@ class Config:
     def kube_deployment_production(cls) -> str:
         return os.environ.get("KUBE_DEPLOYMENT_PRODUCTION", "myapp-production")
 
+    # ── Webhook (optional) ────────────────────────────────────────────────────
+
+    @classmethod
+    def webhook_url(cls) -> str:
+        """Public HTTPS URL Telegram pushes updates to. Empty → long polling."""
+        return os.environ.get("WEBHOOK_URL", "")
+
+    @classmethod
+    def webhook_port(cls) -> int:
+        return int(os.environ.get("WEBHOOK_PORT", "8443"))
+
+    @classmethod
+    def webhook_secret(cls) -> str:
+        return os.environ.get("WEBHOOK_SECRET", "")
+
     # ── Audit Logging ─────────────────────────────────────────────────────────
 
     @classmethod
     def audit_log_path(cls) -> str:
         return os.environ.get("AUDIT_LOG_PATH", "/var/log/deploybot/audit.log")
 
+    @classmethod
+    def audit_log_backups(cls) -> int:
+        """Rotated audit generations to keep; 0 keeps every generation."""
+        return int(os.environ.get("AUDIT_LOG_BACKUPS", "0"))
+
     # ── Validation ────────────────────────────────────────────────────────────
 
     @classmethod
@@ -159,6 +195,10 @@ class Config:
             "ADMIN_TELEGRAM_IDS": os.environ.get("ADMIN_TELEGRAM_IDS", ""),
             "REGISTRY_URL": cls.registry_url(),
         }
+        # Without a secret token anyone who finds the webhook path can
+        # post forged updates, so webhook mode requires one.
+        if cls.webhook_url():
+            required["WEBHOOK_SECRET"] = cls.webhook_secret()
         missing = [k for k, v in required.items() if not v]
         if missing:
             raise EnvironmentError(f"Missing required environment variables: {missing}")
@@ -14,10 +14,9 @@ This prevents command injection attacks completely.
 """
 
 import asyncio
+import contextlib
 import logging
-import re
-import subprocess
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, AsyncIterator, Optional
 
 import aiohttp
 
@@ -25,38 +24,107 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
-# Valid short-SHA / full-SHA: 4-40 hex characters.
-_COMMIT_RE = re.compile(r'^[0-9a-f]{4,40}$')
+# Valid short-SHA / full-SHA: 4-40 lowercase hex characters.
+_HEX_CHARS = frozenset("0123456789abcdef")
 
 _VALID_ENVS = frozenset({"staging", "production"})
 
+# Bytes requested per read of a script's stdout; lines are split locally.
+_READ_CHUNK = 65536
+
+# Unterminated output held before it is emitted as a forced line.
+_MAX_PENDING = _READ_CHUNK * 4
+
+# Line batches (each at most one read chunk) buffered between the stdout
+# reader task and the consumer before the reader stops reading.
+_BUFFERED_BATCHES = 64
+
+# Seconds an abandoned script gets to exit after SIGTERM before SIGKILL.
+_REAP_GRACE = 5
+
+# Seconds to wait for git in get_latest_commit(); an unreachable remote
+# must not hang the /deploy confirmation prompt.
+_GIT_TIMEOUT = 10
+
+# Fixed part of the subprocess environment; the Config-derived part is
+# re-read per call in _safe_env() so env changes are never missed (fix #1).
+_BASE_ENV = {
+    # Fix #8: match the non-root user in Dockerfile (USER botuser)
+    "HOME": "/home/botuser",
+    "PATH": "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin",
+}
+
 
 class DeploymentManager:
 
+    def __init__(self):
+        # Shared HTTP client for health checks, created on first use so it
+        # binds to the running event loop; closed by close() at shutdown.
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared health-check session, (re)creating it if needed."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                # A stuck connect or DNS lookup gives up after 3s instead of
+                # eating the whole 10s budget.
+                timeout=aiohttp.ClientTimeout(
+                    total=10, connect=3, sock_connect=3, sock_read=5
+                ),
+                connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session. Safe to call more than once."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     # ── Git Helpers ────────────────────────────────────────────────────────────
 
-    def get_latest_commit(self, branch: Optional[str] = None) -> str:
+    async def get_latest_commit(self, branch: Optional[str] = None) -> str:
         """
-        Get the latest commit hash from the local git repo.
-        When branch is provided, resolves the remote ref so the returned hash
-        is the tip of that branch, not whatever is checked out locally.
+        Get the latest commit hash for a branch, or of the local checkout.
+
+        When branch is provided the remote is asked directly with
+        `git ls-remote`, so the hash is the branch tip deploy.sh will pull,
+        even if the bot's clone has not fetched recently. Without a branch
+        the local HEAD is resolved with `git rev-parse`.
+
+        Runs git via asyncio.create_subprocess_exec so the fork/exec and the
+        wait never block the event loop. git is killed and "unknown" returned
+        if it takes longer than _GIT_TIMEOUT seconds.
         """
+        if branch:
+            cmd = ("git", "ls-remote", "--quiet", "origin", f"refs/heads/{branch}")
+        else:
+            cmd = ("git", "rev-parse", "--short", "HEAD")
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd="/app/repo",
+            )
+        except OSError:
+            return "unknown"
         try:
-            if branch:
-                result = subprocess.run(
-                    ["git", "rev-parse", "--short", f"origin/{branch}"],
-                    capture_output=True, text=True, check=True,
-                    cwd="/app/repo",
-                )
-            else:
-                result = subprocess.run(
-                    ["git", "rev-parse", "--short", "HEAD"],
-                    capture_output=True, text=True, check=True,
-                    cwd="/app/repo",
-                )
-            return result.stdout.strip()
-        except subprocess.CalledProcessError:
+            async with asyncio.timeout(_GIT_TIMEOUT):
+                stdout, _ = await proc.communicate()
+        except TimeoutError:
+            logger.warning("git %s timed out after %ds", cmd[1], _GIT_TIMEOUT)
+            proc.kill()
+            await proc.wait()
+            return "unknown"
+        if proc.returncode != 0:
             return "unknown"
+        if branch:
+            # "<sha>\trefs/heads/<branch>"; empty when the branch doesn't exist.
+            commit = stdout.split(b"\t", 1)[0].decode().strip()[:7]
+        else:
+            commit = stdout.decode().strip()
+        return commit if _is_commit_hash(commit) else "unknown"
 
     # ── Deployment ─────────────────────────────────────────────────────────────
 
@@ -67,13 +135,9 @@ class DeploymentManager:
         Run the deployment script and stream its output line by line.
 
         Raises ValueError (not AssertionError) for invalid inputs — fix #10.
-        Wrapped in asyncio.wait_for() with a configurable timeout — fix #17.
+        Bounded by a DEPLOY_TIMEOUT_SECONDS deadline — fix #17.
         """
-        # Fix #10: use ValueError, not AssertionError, for input validation.
-        if environment not in _VALID_ENVS:
-            raise ValueError(f"Invalid environment: {environment!r}")
-        if commit != "unknown" and not _COMMIT_RE.match(commit):
-            raise ValueError(f"Suspicious commit hash: {commit!r}")
+        _validate(environment, commit)
 
         deploy_script = "/app/scripts/deploy.sh"
         cmd = [deploy_script, environment, commit]
@@ -89,20 +153,33 @@ class DeploymentManager:
                 env=self._safe_env(),
             )
 
+            # Checked once per run: a verbose build streams thousands of lines
+            # and should skip the logging call entirely when INFO is off.
+            log_lines = logger.isEnabledFor(logging.INFO)
             # Fix #17: enforce a hard timeout so a hanging deploy.sh never
-            # blocks the bot indefinitely.
+            # blocks the bot indefinitely. The deadline bounds only the reads,
+            # never a yield: the consumer's own awaits (Telegram sends) run
+            # between yields, and a timeout firing there would cancel the
+            # consumer instead of killing the script.
+            deadline = asyncio.get_running_loop().time() + timeout
             try:
-                async with asyncio.timeout(timeout):
-                    async for line in proc.stdout:
-                        decoded = line.decode("utf-8", errors="replace").rstrip()
-                        logger.info("[deploy/%s] %s", environment, decoded)
-                        yield decoded
+                async with contextlib.aclosing(
+                    _buffered_line_batches(proc.stdout, deadline)
+                ) as batches:
+                    async for lines in batches:
+                        for line in lines:
+                            if log_lines:
+                                logger.info("[deploy/%s] %s", environment, line)
+                            yield line
+                async with asyncio.timeout_at(deadline):
                     await proc.wait()
             except asyncio.TimeoutError:
                 proc.kill()
                 await proc.wait()
                 yield f"ERROR: Deploy timed out after {timeout}s"
                 return
+            finally:
+                await _reap_abandoned(proc)
 
             if proc.returncode != 0:
                 error_line = f"ERROR: Deploy script exited with code {proc.returncode}"
@@ -115,8 +192,7 @@ class DeploymentManager:
 
     async def run_rollback(self, environment: str) -> AsyncGenerator[str, None]:
         """Stream output from the rollback script with a hard timeout."""
-        if environment not in _VALID_ENVS:
-            raise ValueError(f"Invalid environment: {environment!r}")
+        _validate(environment)
 
         rollback_script = "/app/scripts/rollback.sh"
         cmd = [rollback_script, environment]
@@ -129,17 +205,23 @@ class DeploymentManager:
                 stderr=asyncio.subprocess.STDOUT,
                 env=self._safe_env(),
             )
+            deadline = asyncio.get_running_loop().time() + timeout
             try:
-                async with asyncio.timeout(timeout):
-                    async for line in proc.stdout:
-                        decoded = line.decode("utf-8", errors="replace").rstrip()
-                        yield decoded
+                async with contextlib.aclosing(
+                    _buffered_line_batches(proc.stdout, deadline)
+                ) as batches:
+                    async for lines in batches:
+                        for line in lines:
+                            yield line
+                async with asyncio.timeout_at(deadline):
                     await proc.wait()
             except asyncio.TimeoutError:
                 proc.kill()
                 await proc.wait()
                 yield f"ERROR: Rollback timed out after {timeout}s"
                 return
+            finally:
+                await _reap_abandoned(proc)
 
             if proc.returncode != 0:
                 yield f"ERROR: Rollback script exited with code {proc.returncode}"
@@ -154,59 +236,65 @@ class DeploymentManager:
 
         Fix #2: health checks run concurrently via asyncio.gather(), not
         sequentially — a 10s timeout on one env no longer blocks the other.
+        return_exceptions=True keeps one unexpected failure from discarding
+        the other environments' results; it is reported as unhealthy.
         """
-        staging_health_url = Config.staging_health_url()
-        production_health_url = Config.production_health_url()
-
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=10)
-        ) as session:
-            # Fix #2: concurrent health checks
-            staging_healthy, production_healthy = await asyncio.gather(
-                self._check_health(session, staging_health_url),
-                self._check_health(session, production_health_url),
-            )
+        health_urls = {
+            "staging": Config.staging_health_url(),
+            "production": Config.production_health_url(),
+        }
+
+        # Reusing one session keeps connections to the health endpoints alive
+        # between /status calls instead of a fresh TCP+TLS handshake each time.
+        session = self._get_session()
+        # Fix #2: concurrent health checks; the state-file reads run in worker
+        # threads alongside them instead of blocking the loop afterwards.
+        results, commits, deployed_ats = await asyncio.gather(
+            asyncio.gather(
+                *(self._check_health(session, url) for url in health_urls.values()),
+                return_exceptions=True,
+            ),
+            asyncio.gather(*(self._get_deployed_commit(env) for env in health_urls)),
+            asyncio.gather(*(self._get_deployed_at(env) for env in health_urls)),
+        )
 
         return {
-            "staging": {
-                "health_url": staging_health_url,
-                "commit": self._get_deployed_commit("staging"),
-                "deployed_at": self._get_deployed_at("staging"),
-                "healthy": staging_healthy,
-            },
-            "production": {
-                "health_url": production_health_url,
-                "commit": self._get_deployed_commit("production"),
-                "deployed_at": self._get_deployed_at("production"),
-                "healthy": production_healthy,
-            },
+            env: {
+                "health_url": url,
+                "commit": commit,
+                "deployed_at": deployed_at,
+                "healthy": healthy is True,
+            }
+            for (env, url), healthy, commit, deployed_at in zip(
+                health_urls.items(), results, commits, deployed_ats
+            )
         }
 
     async def _check_health(self, session: aiohttp.ClientSession, url: str) -> bool:
-        """Return True if the health endpoint returns HTTP 200."""
+        """
+        Return True if the health endpoint returns HTTP 200.
+        Probes with HEAD so no body is transferred; endpoints that reject HEAD
+        (405/501) are retried once with GET.
+        """
         try:
-            async with session.get(url) as resp:
-                return resp.status == 200
+            async with session.head(url, allow_redirects=True) as resp:
+                status = resp.status
+            if status in (405, 501):
+                async with session.get(url) as resp:
+                    status = resp.status
+            return status == 200
         except Exception:
             return False
 
-    def _get_deployed_commit(self, environment: str) -> str:
+    async def _get_deployed_commit(self, environment: str) -> str:
         """Read the last deployed commit from a state file written by deploy.sh."""
         state_file = f"/var/lib/deploybot/{environment}.commit"
-        try:
-            with open(state_file) as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "unknown"
+        return await asyncio.to_thread(_read_state_file, state_file, "unknown")
 
-    def _get_deployed_at(self, environment: str) -> str:
+    async def _get_deployed_at(self, environment: str) -> str:
         """Read the last deployment timestamp from a state file."""
         state_file = f"/var/lib/deploybot/{environment}.timestamp"
-        try:
-            with open(state_file) as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "never"
+        return await asyncio.to_thread(_read_state_file, state_file, "never")
 
     # ── Security Helpers ───────────────────────────────────────────────────────
 
@@ -221,9 +309,7 @@ class DeploymentManager:
         credential helpers all resolve paths correctly.
         """
         return {
-            # Fix #8: match the non-root user in Dockerfile (USER botuser)
-            "HOME": "/home/botuser",
-            "PATH": "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin",
+            **_BASE_ENV,
             "REGISTRY_URL": Config.registry_url(),
             "REGISTRY_IMAGE": Config.registry_image(),
             "STAGING_HOST": Config.staging_host(),
@@ -236,3 +322,149 @@ class DeploymentManager:
             "STAGING_HEALTH_URL": Config.staging_health_url(),
             "PRODUCTION_HEALTH_URL": Config.production_health_url(),
         }
+
+
+async def _read_line_batches(stream: asyncio.StreamReader) -> AsyncIterator[list]:
+    """
+    Yield a script's output as lists of decoded lines, one list per chunk read.
+
+    One read() returns everything written since the last one, so a burst of
+    short progress lines costs a single await rather than a readline() each.
+    A line longer than the StreamReader limit (64 KiB) is also fine here,
+    where readline() would abort the whole stream with ValueError.
+
+    Each chunk is cut after its last newline (a UTF-8 multibyte sequence
+    never contains b"\n", so the cut never splits a character), decoded in
+    one call, and split on "\n" only, as readline() did. str.splitlines()
+    would also split on "\r" and other separators, turning one progress bar
+    into dozens of chat lines and audit entries.
+
+    Bytes after the last newline are kept as a list of chunks and joined
+    only once a newline arrives, so output without newlines (progress bars,
+    binary) is not re-copied on every read. Once _MAX_PENDING bytes are
+    held they are emitted as a forced line, keeping memory bounded.
+    """
+    pending: list = []
+    pending_len = 0
+    while chunk := await stream.read(_READ_CHUNK):
+        cut = chunk.rfind(b"\n") + 1
+        if not cut:
+            pending.append(chunk)
+            pending_len += len(chunk)
+            if pending_len >= _MAX_PENDING:
+                yield _decode_lines(b"".join(pending))
+                pending.clear()
+                pending_len = 0
+            continue
+        head = chunk[:cut]
+        if pending:
+            head = b"".join(pending) + head
+            pending.clear()
+        yield _decode_lines(head)
+        if cut < len(chunk):
+            pending.append(chunk[cut:])
+        pending_len = len(chunk) - cut
+    if pending:
+        yield _decode_lines(b"".join(pending))
+
+
+def _decode_lines(data: bytes) -> list:
+    """Decode and split on "\n", trailing whitespace stripped per line."""
+    lines = data.decode("utf-8", errors="replace").split("\n")
+    if not lines[-1]:
+        lines.pop()  # the empty remainder after a final "\n"
+    return [line.rstrip() for line in lines]
+
+
+async def _buffered_line_batches(
+    stream: asyncio.StreamReader, deadline: Optional[float] = None
+) -> AsyncIterator[list]:
+    """
+    _read_line_batches() behind a bounded queue fed by a background task.
+
+    The task keeps reading the script's stdout while the consumer is busy
+    (e.g. waiting on a Telegram send), so a slow chat never stalls the
+    script on a full 64 KiB pipe. Once _BUFFERED_BATCHES batches are
+    waiting, the reader pauses and backpressure reaches the script again.
+    Use under contextlib.aclosing() so the reader is cancelled on early exit.
+
+    With a deadline (in loop.time() terms) each wait for the next batch is
+    bounded by it, and TimeoutError is raised once it has passed.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_BUFFERED_BATCHES)
+
+    async def drain() -> None:
+        try:
+            async for batch in _read_line_batches(stream):
+                await queue.put(batch)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.create_task(drain())
+    try:
+        while True:
+            if deadline is not None and loop.time() >= deadline:
+                raise TimeoutError
+            async with asyncio.timeout_at(deadline):
+                item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        reader.cancel()
+
+
+def _validate(environment: str, commit: Optional[str] = None) -> None:
+    """
+    Shared input check for the deploy and rollback scripts.
+    Fix #10: raises ValueError, not AssertionError, which `python -O` strips.
+    """
+    if environment not in _VALID_ENVS:
+        raise ValueError(f"Invalid environment: {environment!r}")
+    if commit is not None and commit != "unknown" and not _is_commit_hash(commit):
+        raise ValueError(f"Suspicious commit hash: {commit!r}")
+
+
+def _is_commit_hash(commit: str) -> bool:
+    """True for a 4-40 char lowercase hex SHA; a charset check, no regex engine."""
+    return 4 <= len(commit) <= 40 and _HEX_CHARS.issuperset(commit)
+
+
+def _read_state_file(path: str, default: str) -> str:
+    """Blocking read of a deploy.sh state file; run via asyncio.to_thread()."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return default
+
+
+async def _reap_abandoned(proc: asyncio.subprocess.Process) -> None:
+    """
+    Terminate and reap a script whose output stream was abandoned — the
+    consumer closed the generator or its task was cancelled mid-stream.
+    Without this the child keeps running unsupervised and, once nobody reads
+    its stdout, blocks forever on a full pipe. The wait is shielded so a
+    second cancellation cannot leave the child unreaped, and a script that
+    ignores SIGTERM is killed after _REAP_GRACE seconds.
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        proc.terminate()
+    except ProcessLookupError:
+        pass
+    try:
+        await asyncio.wait_for(asyncio.shield(proc.wait()), _REAP_GRACE)
+    except TimeoutError:
+        logger.warning("Script ignored SIGTERM; killing it")
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await asyncio.shield(proc.wait())
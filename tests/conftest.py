@@ -3,7 +3,9 @@ conftest.py - Shared Pytest Fixtures
 """
 import os
 import sys
+from types import SimpleNamespace
 import pytest
+from pytest_asyncio import is_async_test
 from unittest.mock import AsyncMock, MagicMock
 
 _HERE = os.path.dirname(os.path.abspath(__file__))
@@ -12,6 +14,15 @@ if _BOT_DIR not in sys.path:
     sys.path.insert(0, _BOT_DIR)
 
 
+def pytest_collection_modifyitems(items):
+    """Run every async test on one session-wide event loop instead of a fresh
+    loop (and selector) per test; asyncio_mode=auto already collects them."""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+
 @pytest.fixture(autouse=True)
 def set_env(monkeypatch):
     monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "1234567890:test-token-abc")
@@ -35,11 +46,9 @@ def set_env(monkeypatch):
 
 
 def make_user(user_id: int, username: str = "testuser"):
-    user = MagicMock()
-    user.id = user_id
-    user.username = username
-    user.full_name = f"Test User {user_id}"
-    return user
+    # Handlers only read plain attributes off the user and chat, so these are
+    # SimpleNamespaces rather than MagicMock trees.
+    return SimpleNamespace(id=user_id, username=username, full_name=f"Test User {user_id}")
 
 
 def make_update(user_id: int, username: str = "testuser", text: str = "/deploy staging"):
@@ -51,8 +60,7 @@ def make_update(user_id: int, username: str = "testuser", text: str = "/deploy s
     update = MagicMock()
     update.effective_user = user
     update.effective_message = message
-    update.effective_chat = MagicMock()
-    update.effective_chat.id = 99999
+    update.effective_chat = SimpleNamespace(id=99999)
     update.message = message
     return update
 
@@ -66,19 +74,63 @@ def make_callback_update(user_id: int, data: str):
     update = MagicMock()
     update.effective_user = user
     update.callback_query = query
-    update.effective_chat = MagicMock()
-    update.effective_chat.id = 99999
+    update.effective_chat = SimpleNamespace(id=99999)
     return update
 
 
+def last_text(mock) -> str:
+    """Text (first positional arg) of the most recent await of an AsyncMock."""
+    return mock.await_args.args[0]
+
+
 def make_context(args=None):
     context = MagicMock()
     context.args = args or []
+    context.bot_data = {}
     context.bot = MagicMock()
     context.bot.send_message = AsyncMock()
     return context
 
 
+def _set_roles(monkeypatch, *, admin: bool, authorized: bool) -> None:
+    """Pin Config's role predicates; rbac and bot share the same Config class."""
+    from config import Config
+    monkeypatch.setattr(Config, "is_admin", classmethod(lambda cls, _id: admin))
+    monkeypatch.setattr(Config, "is_authorized", classmethod(lambda cls, _id: authorized))
+
+
+@pytest.fixture
+def as_admin(monkeypatch):
+    _set_roles(monkeypatch, admin=True, authorized=True)
+
+@pytest.fixture
+def as_staging_user(monkeypatch):
+    _set_roles(monkeypatch, admin=False, authorized=True)
+
+@pytest.fixture
+def as_unauthorized(monkeypatch):
+    _set_roles(monkeypatch, admin=False, authorized=False)
+
+
+@pytest.fixture
+def mock_audit(monkeypatch):
+    """Replace bot.audit so handler tests never touch the audit log file."""
+    import bot
+    audit = MagicMock()
+    monkeypatch.setattr(bot, "audit", audit)
+    return audit
+
+
+@pytest.fixture
+def mock_manager(monkeypatch):
+    """Replace bot.deploy_manager; the latest commit resolves to abc1234."""
+    import bot
+    manager = MagicMock()
+    manager.get_latest_commit = AsyncMock(return_value="abc1234")
+    monkeypatch.setattr(bot, "deploy_manager", manager)
+    return manager
+
+
 @pytest.fixture
 def admin_update():
     return make_update(user_id=111, username="admin_user")
@@ -1,7 +1,9 @@
 """test_audit_logger.py - Tests for AuditLogger"""
-import json
 import os
+from pathlib import Path
+import orjson
 import pytest
+from unittest.mock import patch
 from audit_logger import AuditLogger
 
 @pytest.fixture
@@ -12,6 +14,11 @@ def tmp_log(tmp_path):
 USER = {"id": 111, "username": "alice", "full_name": "Alice Admin"}
 
 
+def read_events(path) -> list:
+    """Parse every JSON line in the log with a single read."""
+    return [orjson.loads(line) for line in Path(path).read_bytes().splitlines() if line.strip()]
+
+
 class TestAuditLoggerWrite:
     def test_log_creates_file_if_not_exists(self, tmp_log):
         logger, path = tmp_log
@@ -22,15 +29,13 @@ class TestAuditLoggerWrite:
     def test_log_writes_valid_json(self, tmp_log):
         logger, path = tmp_log
         logger.log(USER, "deploy_started", {"env": "staging", "commit": "abc123"})
-        with open(path) as f:
-            event = json.loads(f.readline())
+        event = read_events(path)[0]
         assert event["action"] == "deploy_started"
 
     def test_log_includes_user_fields(self, tmp_log):
         logger, path = tmp_log
         logger.log(USER, "deploy_started", {})
-        with open(path) as f:
-            event = json.loads(f.readline())
+        event = read_events(path)[0]
         assert event["user_id"] == 111
         assert event["username"] == "alice"
 
@@ -40,8 +45,7 @@ class TestAuditLoggerWrite:
         # Pass metadata that tries to overwrite the action and user_id fields
         malicious_metadata = {"action": "fake_action", "user_id": 0}
         logger.log(USER, "deploy_started", malicious_metadata)
-        with open(path) as f:
-            event = json.loads(f.readline())
+        event = read_events(path)[0]
         # Core fields must win
         assert event["action"] == "deploy_started", "metadata must not overwrite action"
         assert event["user_id"] == 111, "metadata must not overwrite user_id"
@@ -50,53 +54,244 @@ class TestAuditLoggerWrite:
         """Non-conflicting metadata fields should still appear in the event."""
         logger, path = tmp_log
         logger.log(USER, "deploy_success", {"env": "production", "commit": "def456"})
-        with open(path) as f:
-            event = json.loads(f.readline())
+        event = read_events(path)[0]
         assert event["env"] == "production"
         assert event["commit"] == "def456"
 
+    def test_non_json_metadata_is_stringified(self, tmp_log):
+        """Metadata json.dumps(default=str) accepted must not crash the caller."""
+        from decimal import Decimal
+        logger, path = tmp_log
+        logger.log(USER, "deploy_started", {1: "one", "cost": Decimal("1.5"), "tags": {"a"}})
+        event = read_events(path)[0]
+        assert event["1"] == "one"
+        assert event["cost"] == "1.5"
+        assert event["tags"] == "{'a'}"
+
+    def test_unserializable_metadata_falls_back_to_repr(self, tmp_log):
+        logger, path = tmp_log
+        logger.log(USER, "deploy_started", {"big": 2 ** 70})
+        event = read_events(path)[0]
+        assert event["action"] == "deploy_started"
+        assert event["metadata_repr"] == repr({"big": 2 ** 70})
+
     def test_multiple_logs_append_as_separate_lines(self, tmp_log):
         logger, path = tmp_log
         logger.log(USER, "deploy_started", {"env": "staging"})
         logger.log(USER, "deploy_success", {"env": "staging"})
-        with open(path) as f:
-            lines = [l for l in f.readlines() if l.strip()]
-        assert len(lines) == 2
+        assert len(read_events(path)) == 2
 
     def test_log_does_not_raise_on_ioerror(self, tmp_path):
-        from unittest.mock import patch
         log_path = str(tmp_path / "audit.log")
         audit_logger = AuditLogger(log_path=log_path)
-        with patch("builtins.open", side_effect=OSError("Permission denied")):
+        with patch("os.open", side_effect=OSError("Permission denied")):
             audit_logger.log(USER, "deploy_started", {})  # must not raise
 
+    def test_log_reuses_descriptor_across_calls(self, tmp_log):
+        logger, _ = tmp_log
+        with patch("os.open", wraps=os.open) as mock_open:
+            logger.log(USER, "deploy_started", {})
+            logger.log(USER, "deploy_success", {})
+        assert mock_open.call_count == 1
+
+    def test_log_reopens_after_stale_descriptor(self, tmp_log):
+        logger, path = tmp_log
+        logger.log(USER, "deploy_started", {})
+        os.close(logger._fd)  # simulate the fd going away underneath us
+        logger.log(USER, "deploy_success", {})
+        actions = [e["action"] for e in read_events(path)]
+        assert actions == ["deploy_started", "deploy_success"]
+
+
+class TestTimestamp:
+    def test_matches_datetime_isoformat(self):
+        from datetime import datetime, timezone
+        from audit_logger import _utc_timestamp
+        for now in (1_700_000_000.25, 1_700_000_000.5, 1_700_000_001.000001):
+            with patch("audit_logger.time.time", return_value=now):
+                expected = datetime.fromtimestamp(now, timezone.utc).isoformat()
+                assert _utc_timestamp()[:19] == expected[:19]
+                assert _utc_timestamp().endswith("+00:00")
+
+    def test_second_prefix_is_formatted_once_per_second(self):
+        from audit_logger import _utc_timestamp
+        with patch("audit_logger.time.time", return_value=1_700_000_000.1):
+            _utc_timestamp()
+        with patch("audit_logger.time.time", return_value=1_700_000_000.9), \
+             patch("audit_logger.time.strftime") as mock_strftime:
+            assert _utc_timestamp().endswith(".900000+00:00")
+        mock_strftime.assert_not_called()
+
 
 class TestGetRecent:
-    def test_get_recent_returns_empty_list_when_no_file(self, tmp_path):
+    async def test_get_recent_returns_empty_list_when_no_file(self, tmp_path):
         logger = AuditLogger(log_path=str(tmp_path / "nonexistent.log"))
-        assert logger.get_recent() == []
+        assert await logger.get_recent() == []
 
-    def test_get_recent_respects_limit(self, tmp_log):
+    async def test_get_recent_respects_limit(self, tmp_log):
         logger, _ = tmp_log
         for i in range(10):
             logger.log(USER, f"action_{i}", {})
-        result = logger.get_recent(limit=3)
+        result = await logger.get_recent(limit=3)
         assert len(result) == 3
 
-    def test_get_recent_returns_last_n_events(self, tmp_log):
+    async def test_get_recent_returns_last_n_events(self, tmp_log):
         logger, _ = tmp_log
         for i in range(5):
             logger.log(USER, f"action_{i}", {"seq": i})
-        result = logger.get_recent(limit=2)
+        result = await logger.get_recent(limit=2)
         assert result[0]["seq"] == 3
         assert result[1]["seq"] == 4
 
-    def test_get_recent_handles_corrupt_line(self, tmp_log):
+    async def test_get_recent_handles_corrupt_line(self, tmp_log):
         """A single corrupt line must not cause all events to be lost."""
         logger, path = tmp_log
         logger.log(USER, "good_event", {})
         with open(path, "a") as f:
             f.write("this is not json\n")
-        result = logger.get_recent()
+        result = await logger.get_recent()
         assert len(result) == 1
         assert result[0]["action"] == "good_event"
+
+    async def test_get_recent_returns_tail_of_long_log(self, tmp_log):
+        logger, _ = tmp_log
+        for i in range(50):
+            logger.log(USER, f"action_{i}", {"seq": i})
+        result = await logger.get_recent(limit=5)
+        assert [e["seq"] for e in result] == [45, 46, 47, 48, 49]
+
+    async def test_get_recent_on_empty_file(self, tmp_log):
+        """An empty file cannot be memory-mapped; it must read as no events."""
+        logger, path = tmp_log
+        open(path, "wb").close()
+        assert await logger.get_recent() == []
+
+    def test_reversed_lines_without_trailing_newline(self, tmp_path):
+        from audit_logger import _read_lines_reversed
+        path = tmp_path / "lines.log"
+        path.write_bytes(b"".join(b"line %04d\n" % i for i in range(200)) + b"tail")
+        with open(path, "rb") as f:
+            lines = list(_read_lines_reversed(f))
+        assert lines[0] == b"tail"
+        assert lines[1] == b"line 0199" and lines[-1] == b"line 0000"
+        assert len(lines) == 201
+
+
+class TestRotation:
+    def test_log_rotates_past_max_bytes(self, tmp_path):
+        path = str(tmp_path / "audit.log")
+        logger = AuditLogger(log_path=path, max_bytes=500)
+        for i in range(20):
+            logger.log(USER, f"action_{i}", {"seq": i})
+        assert os.path.getsize(path + ".1") > 500
+        assert not os.path.exists(path) or os.path.getsize(path) <= 500 + 200
+
+    async def test_get_recent_reads_into_rotated_file(self, tmp_path):
+        path = str(tmp_path / "audit.log")
+        logger = AuditLogger(log_path=path, max_bytes=1000)
+        for i in range(10):
+            logger.log(USER, f"action_{i}", {"seq": i})
+            logger.flush_sync()  # one event per batch, so rotation can split them
+        current = len(read_events(path))
+        result = await logger.get_recent(limit=20)
+        seqs = [e["seq"] for e in result]
+        assert len(seqs) > current
+        assert seqs == list(range(10 - len(seqs), 10))
+
+    def test_rotation_keeps_every_generation_by_default(self, tmp_path):
+        path = str(tmp_path / "audit.log")
+        logger = AuditLogger(log_path=path, max_bytes=300, backups=0)
+        for i in range(20):
+            logger.log(USER, f"action_{i}", {"seq": i})
+        files = sorted(tmp_path.glob("audit.log.*"), key=lambda p: -int(p.suffix[1:]))
+        assert len(files) > 2
+        seqs = [e["seq"] for f in files + [Path(path)] if f.exists() for e in read_events(f)]
+        assert seqs == list(range(20))
+
+    async def test_get_recent_walks_all_generations(self, tmp_path):
+        path = str(tmp_path / "audit.log")
+        logger = AuditLogger(log_path=path, max_bytes=300, backups=0)
+        for i in range(20):
+            logger.log(USER, f"action_{i}", {"seq": i})
+            logger.flush_sync()
+        assert [e["seq"] for e in await logger.get_recent(limit=100)] == list(range(20))
+
+    def test_backups_cap_deletes_oldest_with_warning(self, tmp_path, caplog):
+        path = str(tmp_path / "audit.log")
+        logger = AuditLogger(log_path=path, max_bytes=300, backups=2)
+        with caplog.at_level("WARNING", logger="audit_logger"):
+            for i in range(20):
+                logger.log(USER, f"action_{i}", {"seq": i})
+        assert sorted(p.name for p in tmp_path.glob("audit.log.*")) == ["audit.log.1", "audit.log.2"]
+        assert "Deleting audit log generation" in caplog.text
+
+    def test_size_counts_existing_file(self, tmp_path):
+        """A restart must not reset the size count on an already-large log."""
+        path = tmp_path / "audit.log"
+        path.write_bytes(b"x" * 600 + b"\n")
+        logger = AuditLogger(log_path=str(path), max_bytes=500)
+        logger.log(USER, "after_restart", {})
+        assert (tmp_path / "audit.log.1").exists()
+
+
+class TestBufferedWrites:
+    async def test_events_in_loop_are_written_off_the_loop_thread(self, tmp_log):
+        import threading
+        logger, path = tmp_log
+        writer_threads = []
+        real_writev = os.writev
+
+        def recording_writev(fd, iov):
+            writer_threads.append(threading.get_ident())
+            return real_writev(fd, iov)
+
+        with patch("os.writev", side_effect=recording_writev):
+            logger.log(USER, "deploy_started", {})
+            logger.log(USER, "deploy_success", {})
+            logger.flush_sync()
+        assert writer_threads
+        assert threading.get_ident() not in writer_threads
+        assert len(read_events(path)) == 2
+
+    async def test_buffered_batch_is_fsynced(self, tmp_log):
+        logger, _ = tmp_log
+        with patch("os.fsync") as mock_fsync:
+            logger.log(USER, "deploy_started", {})
+            logger.flush_sync()
+        mock_fsync.assert_called_with(logger._fd)
+
+    def test_inline_event_is_one_writev(self, tmp_log):
+        logger, path = tmp_log
+        with patch("os.writev", wraps=os.writev) as mock_writev:
+            logger.log(USER, "deploy_started", {})
+        mock_writev.assert_called_once()
+        payload, newline = mock_writev.call_args.args[1]
+        assert newline == b"\n"
+        assert orjson.loads(payload)["action"] == "deploy_started"
+
+    async def test_writev_splits_batches_larger_than_iov_max(self, tmp_log, monkeypatch):
+        import audit_logger
+        monkeypatch.setattr(audit_logger, "_IOV_MAX", 4)
+        logger, path = tmp_log
+        iov = []
+        for i in range(5):
+            iov += (f'{{"seq": {i}}}'.encode(), b"\n")
+        with patch("os.writev", wraps=os.writev) as mock_writev:
+            logger._write(iov)
+        assert mock_writev.call_count == 3
+        assert [e["seq"] for e in await logger.get_recent()] == [0, 1, 2, 3, 4]
+
+    async def test_get_recent_sees_buffered_events(self, tmp_log):
+        logger, _ = tmp_log
+        logger.log(USER, "deploy_started", {})
+        assert [e["action"] for e in await logger.get_recent()] == ["deploy_started"]
+
+    def test_payload_not_decoded_when_info_disabled(self, tmp_log):
+        """The file write must not depend on the app logger's level."""
+        import audit_logger
+        logger, path = tmp_log
+        with patch.object(audit_logger.logger, "isEnabledFor", return_value=False), \
+             patch.object(audit_logger.logger, "info") as mock_info:
+            logger.log(USER, "deploy_started", {})
+        mock_info.assert_not_called()
+        assert os.path.getsize(path) > 0
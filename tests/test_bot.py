@@ -1,116 +1,96 @@
 """test_bot.py - Integration tests for Telegram command handlers"""
-import pytest
+import logging
+import logging.handlers
+
 from unittest.mock import AsyncMock, MagicMock, patch
-from conftest import make_update, make_context, make_callback_update
+from conftest import make_update, make_context, make_callback_update, last_text
+
+import bot
+from bot import (
+    _issue_deploy_token,
+    _run_deployment,
+    _start_log_listener,
+    _stream_to_chat,
+    _utc_now_str,
+    cmd_deploy,
+    cmd_help,
+    cmd_rollback,
+    cmd_status,
+    error_handler,
+    handle_callback,
+    send_chunked,
+)
 
 
 class TestHelpCommand:
-    @pytest.mark.asyncio
-    async def test_unauthorized_user_gets_denied(self):
-        from bot import cmd_help
+    async def test_unauthorized_user_gets_denied(self, as_unauthorized):
         update = make_update(user_id=999)
-        with patch("bot.Config.is_authorized", return_value=False), \
-             patch("bot.Config.is_admin", return_value=False):
-            await cmd_help(update, make_context())
-        msg = update.message.reply_text.call_args[0][0]
+        await cmd_help(update, make_context())
+        msg = last_text(update.message.reply_text)
         assert "not authorized" in msg.lower()
 
-    @pytest.mark.asyncio
-    async def test_staging_user_sees_limited_commands(self):
-        from bot import cmd_help
+    async def test_staging_user_sees_limited_commands(self, as_staging_user):
         update = make_update(user_id=333)
-        with patch("bot.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=False):
-            await cmd_help(update, make_context())
-        msg = update.message.reply_text.call_args[0][0]
+        await cmd_help(update, make_context())
+        msg = last_text(update.message.reply_text)
         assert "/deploy staging" in msg
         assert "/deploy production" not in msg
 
-    @pytest.mark.asyncio
-    async def test_admin_user_sees_all_commands(self):
-        from bot import cmd_help
+    async def test_admin_user_sees_all_commands(self, as_admin):
         update = make_update(user_id=111)
-        with patch("bot.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=True):
-            await cmd_help(update, make_context())
-        msg = update.message.reply_text.call_args[0][0]
+        await cmd_help(update, make_context())
+        msg = last_text(update.message.reply_text)
         assert "/deploy production" in msg
         assert "/rollback production" in msg
 
 
 class TestDeployCommand:
-    @pytest.mark.asyncio
-    async def test_deploy_without_args_shows_usage(self):
-        from bot import cmd_deploy
+    async def test_deploy_without_args_shows_usage(self, as_staging_user):
         update = make_update(user_id=333)
         ctx = make_context(args=[])
-        with patch("rbac.Config.is_authorized", return_value=True):
-            await cmd_deploy(update, ctx)
-        msg = update.message.reply_text.call_args[0][0]
+        await cmd_deploy(update, ctx)
+        msg = last_text(update.message.reply_text)
         assert "usage" in msg.lower() or "/deploy" in msg.lower()
 
-    @pytest.mark.asyncio
-    async def test_deploy_invalid_env_shows_usage(self):
-        from bot import cmd_deploy
+    async def test_deploy_invalid_env_shows_usage(self, as_staging_user):
         update = make_update(user_id=333)
         ctx = make_context(args=["invalid_env"])
-        with patch("rbac.Config.is_authorized", return_value=True):
-            await cmd_deploy(update, ctx)
+        await cmd_deploy(update, ctx)
         update.message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
-    async def test_staging_user_blocked_from_production(self):
-        from bot import cmd_deploy
+    async def test_staging_user_blocked_from_production(self, as_staging_user, mock_audit):
         update = make_update(user_id=333)
         ctx = make_context(args=["production"])
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=False):
-            await cmd_deploy(update, ctx)
-        msg = update.message.reply_text.call_args[0][0]
+        await cmd_deploy(update, ctx)
+        msg = last_text(update.message.reply_text)
         assert any(word in msg.lower() for word in ["admin", "denied", "require", "production"])
 
-    @pytest.mark.asyncio
-    async def test_unauthorized_user_blocked_entirely(self):
-        from bot import cmd_deploy
+    async def test_unauthorized_user_blocked_entirely(self, as_unauthorized):
         update = make_update(user_id=999)
         ctx = make_context(args=["staging"])
-        with patch("rbac.Config.is_authorized", return_value=False):
-            await cmd_deploy(update, ctx)
+        await cmd_deploy(update, ctx)
         update.effective_message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
-    async def test_admin_deploy_production_shows_confirmation(self):
-        from bot import cmd_deploy
+    async def test_admin_deploy_production_shows_confirmation(self, as_admin, mock_manager):
         update = make_update(user_id=111)
         ctx = make_context(args=["production"])
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=True), \
-             patch("bot.deploy_manager") as mock_mgr:
-            mock_mgr.get_latest_commit.return_value = "abc1234"
-            await cmd_deploy(update, ctx)
+        await cmd_deploy(update, ctx)
         update.message.reply_text.assert_awaited_once()
         call_kwargs = update.message.reply_text.call_args[1]
         assert "reply_markup" in call_kwargs
 
-    @pytest.mark.asyncio
-    async def test_confirm_dialog_uses_config_branch_not_local_head(self):
+    async def test_confirm_dialog_uses_config_branch_not_local_head(self, as_admin, mock_manager):
         """Fix #13: confirmation shows the configured production branch, not local HEAD."""
-        from bot import cmd_deploy
         update = make_update(user_id=111)
         ctx = make_context(args=["production"])
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=True), \
-             patch("bot.Config.github_branch_production", return_value="main"), \
-             patch("bot.deploy_manager") as mock_mgr:
-            mock_mgr.get_latest_commit.return_value = "abc1234"
+        with patch("bot.Config.github_branch_production", return_value="main"):
             await cmd_deploy(update, ctx)
-        msg = update.message.reply_text.call_args[0][0]
+        msg = last_text(update.message.reply_text)
         assert "main" in msg
 
-    @pytest.mark.asyncio
-    async def test_staging_deploy_runs_for_staging_user(self):
-        from bot import cmd_deploy
-        import bot
+    async def test_staging_deploy_runs_for_staging_user(
+        self, as_staging_user, mock_manager, mock_audit
+    ):
         bot._deploying.clear()
         update = make_update(user_id=333)
         ctx = make_context(args=["staging"])
@@ -119,21 +99,15 @@ class TestDeployCommand:
             yield "[INFO] Pulling code"
             yield "[INFO] Build complete"
 
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=False), \
-             patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.send_chunked", new_callable=AsyncMock), \
-             patch("bot.audit"):
-            mock_mgr.get_latest_commit.return_value = "abc1234"
-            mock_mgr.run_deployment = fake_deploy
+        mock_manager.run_deployment = fake_deploy
+        with patch("bot.send_chunked", new_callable=AsyncMock):
             await cmd_deploy(update, ctx)
         ctx.bot.send_message.assert_awaited()
 
-    @pytest.mark.asyncio
-    async def test_failed_deploy_triggers_rollback(self):
+    async def test_failed_deploy_triggers_rollback(
+        self, as_staging_user, mock_manager, mock_audit
+    ):
         """Deploy failure must trigger auto-rollback."""
-        from bot import cmd_deploy
-        import bot
         bot._deploying.clear()
         update = make_update(user_id=333)
         ctx = make_context(args=["staging"])
@@ -148,30 +122,20 @@ class TestDeployCommand:
             rollback_called.append(env)
             yield "[ROLLBACK] Done"
 
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.Config.is_admin", return_value=False), \
-             patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.send_chunked", new_callable=AsyncMock), \
-             patch("bot.audit"):
-            mock_mgr.get_latest_commit.return_value = "abc1234"
-            mock_mgr.run_deployment = fake_deploy_fail
-            mock_mgr.run_rollback = tracking_rollback
+        mock_manager.run_deployment = fake_deploy_fail
+        mock_manager.run_rollback = tracking_rollback
+        with patch("bot.send_chunked", new_callable=AsyncMock):
             await cmd_deploy(update, ctx)
 
         assert rollback_called, "Rollback must be called when deployment fails"
 
-    @pytest.mark.asyncio
-    async def test_deploy_lock_prevents_concurrent_deploys(self):
+    async def test_deploy_lock_prevents_concurrent_deploys(self, mock_manager):
         """Fix #5: second deploy to same env is rejected while first is running."""
-        from bot import _run_deployment
-        import bot
         bot._deploying.add("staging")
         try:
             update = make_update(user_id=333)
             ctx = make_context()
-            with patch("bot.deploy_manager") as mock_mgr:
-                mock_mgr.get_latest_commit.return_value = "abc1234"
-                await _run_deployment(update, ctx, "staging", {"id": 333, "username": "u", "full_name": "u"})
+            await _run_deployment(update, ctx, "staging", {"id": 333, "username": "u", "full_name": "u"})
             # Should send "already in progress" message, not start a deploy
             sent_texts = [call[1].get("text", "") or call[0][0] if call[0] else call[1].get("text","")
                          for call in ctx.bot.send_message.call_args_list]
@@ -180,11 +144,8 @@ class TestDeployCommand:
         finally:
             bot._deploying.discard("staging")
 
-    @pytest.mark.asyncio
-    async def test_deploy_lock_released_after_success(self):
+    async def test_deploy_lock_released_after_success(self, mock_manager, mock_audit):
         """Fix #5: lock must be released after deploy completes."""
-        from bot import _run_deployment
-        import bot
         bot._deploying.clear()
 
         async def fake_deploy(env, commit):
@@ -192,20 +153,14 @@ class TestDeployCommand:
 
         update = make_update(user_id=333)
         ctx = make_context()
-        with patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.send_chunked", new_callable=AsyncMock), \
-             patch("bot.audit"):
-            mock_mgr.get_latest_commit.return_value = "abc1234"
-            mock_mgr.run_deployment = fake_deploy
+        mock_manager.run_deployment = fake_deploy
+        with patch("bot.send_chunked", new_callable=AsyncMock):
             await _run_deployment(update, ctx, "staging", {"id": 333, "username": "u", "full_name": "u"})
 
         assert "staging" not in bot._deploying, "Lock must be released after deploy"
 
-    @pytest.mark.asyncio
-    async def test_deploy_lock_released_after_exception(self):
+    async def test_deploy_lock_released_after_exception(self, mock_manager, mock_audit):
         """Fix #5: lock must be released even if deploy raises an exception."""
-        from bot import _run_deployment
-        import bot
         bot._deploying.clear()
 
         async def exploding_deploy(env, commit):
@@ -214,141 +169,148 @@ class TestDeployCommand:
 
         update = make_update(user_id=333)
         ctx = make_context()
-        with patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.audit"):
-            mock_mgr.get_latest_commit.return_value = "abc1234"
-            mock_mgr.run_deployment = exploding_deploy
-            try:
-                await _run_deployment(update, ctx, "staging", {"id": 333, "username": "u", "full_name": "u"})
-            except Exception:
-                pass
+        mock_manager.run_deployment = exploding_deploy
+        try:
+            await _run_deployment(update, ctx, "staging", {"id": 333, "username": "u", "full_name": "u"})
+        except Exception:
+            pass
 
         assert "staging" not in bot._deploying, "Lock must be released even after exception"
 
 
 class TestRollbackCommand:
-    @pytest.mark.asyncio
-    async def test_rollback_requires_admin(self):
-        from bot import cmd_rollback
+    async def test_rollback_requires_admin(self, as_staging_user):
         update = make_update(user_id=333)
         ctx = make_context(args=["production"])
-        with patch("rbac.Config.is_admin", return_value=False):
-            await cmd_rollback(update, ctx)
+        await cmd_rollback(update, ctx)
         update.effective_message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
-    async def test_rollback_without_args_shows_usage(self):
-        from bot import cmd_rollback
+    async def test_rollback_without_args_shows_usage(self, as_admin):
         update = make_update(user_id=111)
         ctx = make_context(args=[])
-        with patch("rbac.Config.is_admin", return_value=True):
-            await cmd_rollback(update, ctx)
+        await cmd_rollback(update, ctx)
         update.message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
-    async def test_admin_can_rollback_production(self):
-        from bot import cmd_rollback
+    async def test_admin_can_rollback_production(self, as_admin, mock_manager, mock_audit):
         update = make_update(user_id=111)
         ctx = make_context(args=["production"])
 
         async def fake_rollback(env):
             yield "[ROLLBACK] Restoring previous image"
 
-        with patch("rbac.Config.is_admin", return_value=True), \
-             patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.audit") as mock_audit:
-            mock_mgr.run_rollback = fake_rollback
-            await cmd_rollback(update, ctx)
-            mock_audit.log.assert_called()
+        mock_manager.run_rollback = fake_rollback
+        await cmd_rollback(update, ctx)
+        mock_audit.log.assert_called()
         ctx.bot.send_message.assert_awaited()
 
 
 class TestStatusCommand:
-    @pytest.mark.asyncio
-    async def test_status_requires_staging_role(self):
-        from bot import cmd_status
+    async def test_status_requires_staging_role(self, as_unauthorized):
         update = make_update(user_id=999)
-        with patch("rbac.Config.is_authorized", return_value=False):
-            await cmd_status(update, make_context())
+        await cmd_status(update, make_context())
         update.effective_message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
-    async def test_status_shows_both_environments(self):
-        from bot import cmd_status
+    async def test_status_shows_both_environments(self, as_staging_user, mock_manager, mock_audit):
         update = make_update(user_id=333)
         fake_status = {
             "staging": {"healthy": True, "commit": "abc123", "deployed_at": "2024-01-01", "health_url": "http://s/health"},
             "production": {"healthy": False, "commit": "def456", "deployed_at": "2024-01-02", "health_url": "http://p/health"},
         }
-        with patch("rbac.Config.is_authorized", return_value=True), \
-             patch("bot.deploy_manager") as mock_mgr, \
-             patch("bot.audit"):
-            mock_mgr.get_status = AsyncMock(return_value=fake_status)
-            await cmd_status(update, make_context())
-        msg = update.message.reply_text.call_args[0][0]
+        mock_manager.get_status = AsyncMock(return_value=fake_status)
+        await cmd_status(update, make_context())
+        msg = last_text(update.message.reply_text)
         assert "staging" in msg.lower()
         assert "production" in msg.lower()
 
 
 class TestCallbackHandler:
-    @pytest.mark.asyncio
-    async def test_cancel_callback_cancels_deploy(self):
-        from bot import handle_callback
+    async def test_cancel_callback_cancels_deploy(self, mock_audit):
         update = make_callback_update(user_id=111, data="deploy:cancel")
-        with patch("bot.audit"):
-            await handle_callback(update, make_context())
-        msg = update.callback_query.edit_message_text.call_args[0][0]
+        await handle_callback(update, make_context())
+        msg = last_text(update.callback_query.edit_message_text)
         assert "cancel" in msg.lower()
 
-    @pytest.mark.asyncio
-    async def test_production_callback_rerequires_admin(self):
-        from bot import handle_callback
+    async def test_production_callback_rerequires_admin(self, as_staging_user):
         update = make_callback_update(user_id=333, data="deploy:production:abc1234")
-        with patch("bot.Config.is_admin", return_value=False):
-            await handle_callback(update, make_context())
-        msg = update.callback_query.edit_message_text.call_args[0][0]
+        await handle_callback(update, make_context())
+        msg = last_text(update.callback_query.edit_message_text)
         assert any(w in msg.lower() for w in ["permission", "denied", "no longer"])
 
-    @pytest.mark.asyncio
-    async def test_callback_blocked_when_deploy_in_flight(self):
+    async def test_callback_blocked_when_deploy_in_flight(self, as_admin):
         """Fix #5: callback must be rejected if env is already deploying."""
-        from bot import handle_callback
-        import bot
         bot._deploying.add("production")
         try:
-            update = make_callback_update(user_id=111, data="deploy:production:abc1234")
-            with patch("bot.Config.is_admin", return_value=True):
-                await handle_callback(update, make_context())
-            msg = update.callback_query.edit_message_text.call_args[0][0]
+            ctx = make_context()
+            token = bot._issue_deploy_token(ctx, 111, "production", "abc1234")
+            update = make_callback_update(user_id=111, data=f"deploy:{token}")
+            await handle_callback(update, ctx)
+            msg = last_text(update.callback_query.edit_message_text)
             assert "already" in msg.lower() or "progress" in msg.lower()
         finally:
             bot._deploying.discard("production")
 
-    @pytest.mark.asyncio
     async def test_none_user_in_callback_is_handled_gracefully(self):
         """Fix #3: callback with None user must not raise AttributeError."""
-        from bot import handle_callback
         update = make_callback_update(user_id=111, data="deploy:cancel")
         update.effective_user = None
         # Should return silently without crashing
         await handle_callback(update, make_context())
 
-    @pytest.mark.asyncio
-    async def test_callback_with_colon_in_commit_hash(self):
+    async def test_callback_with_unknown_token_is_rejected(self, as_admin, mock_audit):
+        """Legacy/forged callback_data that names no pending confirmation must not deploy."""
+        update = make_callback_update(user_id=111, data="deploy:production:abc1234")
+        with patch("bot._run_deployment", new_callable=AsyncMock) as mock_run:
+            await handle_callback(update, make_context())
+        mock_run.assert_not_awaited()
+        msg = last_text(update.callback_query.edit_message_text)
+        assert "no longer valid" in msg.lower()
+
+    async def test_callback_issued_to_another_user_is_rejected(self, as_admin, mock_audit):
+        """A confirm button only works for the admin who requested it."""
+        ctx = make_context()
+        token = _issue_deploy_token(ctx, 222, "production", "abc1234")
+        update = make_callback_update(user_id=111, data=f"deploy:{token}")
+        with patch("bot._run_deployment", new_callable=AsyncMock) as mock_run:
+            await handle_callback(update, ctx)
+        mock_run.assert_not_awaited()
+        assert token in ctx.bot_data["pending_deploys"]  # still usable by its owner
+        update.callback_query.edit_message_text.assert_not_awaited()  # keyboard kept
+        update.callback_query.answer.assert_awaited_once_with(
+            "This confirmation belongs to another admin.", show_alert=True
+        )
+        assert mock_audit.log.call_args.args[1] == "deploy_callback_wrong_user"
+
+    async def test_token_callback_runs_confirmed_commit_once(self, as_admin, mock_audit):
+        bot._deploying.clear()
+        ctx = make_context()
+        token = _issue_deploy_token(ctx, 111, "production", "abc1234")
+        with patch("bot._run_deployment", new_callable=AsyncMock) as mock_run:
+            await handle_callback(make_callback_update(user_id=111, data=f"deploy:{token}"), ctx)
+            await handle_callback(make_callback_update(user_id=111, data=f"deploy:{token}"), ctx)
+        mock_run.assert_awaited_once()
+        assert mock_run.await_args.args[2] == "production"
+        assert mock_run.await_args.kwargs["confirmed_commit"] == "abc1234"
+
+    async def test_expired_token_is_rejected(self, as_admin, mock_audit):
+        ctx = make_context()
+        token = _issue_deploy_token(ctx, 111, "production", "abc1234")
+        ctx.bot_data["pending_deploys"][token]["exp"] = 0
+        update = make_callback_update(user_id=111, data=f"deploy:{token}")
+        with patch("bot._run_deployment", new_callable=AsyncMock) as mock_run:
+            await handle_callback(update, ctx)
+        mock_run.assert_not_awaited()
+
+    async def test_callback_with_colon_in_commit_hash(self, as_staging_user):
         """maxsplit=2 means colons in the commit slot are handled correctly."""
-        from bot import handle_callback
         update = make_callback_update(user_id=333, data="deploy:production:abc:extra")
-        with patch("bot.Config.is_admin", return_value=False):
-            await handle_callback(update, make_context())
-        msg = update.callback_query.edit_message_text.call_args[0][0]
+        await handle_callback(update, make_context())
+        msg = last_text(update.callback_query.edit_message_text)
         assert any(w in msg.lower() for w in ["permission", "denied", "no longer"])
 
 
 class TestStreamToChat:
-    @pytest.mark.asyncio
-    async def test_flushes_on_count(self):
-        """Buffer flushes when 10 lines accumulate."""
-        from bot import _stream_to_chat
+    async def test_flushes_on_size(self):
+        """Buffer flushes once the buffered text reaches the size threshold."""
         ctx = make_context()
         flush_calls = []
 
@@ -356,19 +318,116 @@ class TestStreamToChat:
             flush_calls.append(text)
 
         async def gen():
-            for i in range(10):
-                yield f"line {i}"
+            for i in range(100):
+                yield f"{i:03d}" + "x" * 46  # 50 chars per line incl. newline
 
         with patch("bot.send_chunked", side_effect=fake_send_chunked):
             success, lines = await _stream_to_chat(ctx, 123, gen())
 
-        assert len(flush_calls) >= 1
+        # 3800 chars triggers one mid-stream flush; the rest is drained at the end.
+        assert len(flush_calls) == 2
+        assert len(flush_calls[0]) < 4000
         assert success is True
 
-    @pytest.mark.asyncio
+    async def test_flushed_text_preserves_lines(self):
+        """Buffered lines reach send_chunked newline-joined, without a trailing newline."""
+        ctx = make_context()
+        sent = []
+
+        async def fake_send_chunked(context, chat_id, text):
+            sent.append(text)
+
+        async def gen():
+            yield "first"
+            yield "second"
+
+        with patch("bot.send_chunked", side_effect=fake_send_chunked):
+            _, lines = await _stream_to_chat(ctx, 123, gen())
+
+        assert "".join(sent) == "first\nsecond"
+        assert lines == ["first", "second"]
+
+    async def test_flushes_buffered_lines_while_generator_is_quiet(self, monkeypatch):
+        """A stalled script must not hold back lines already received."""
+        import asyncio
+        monkeypatch.setattr(bot, "_FLUSH_INTERVAL", 0.05)
+        ctx = make_context()
+        sent = []
+
+        async def fake_send_chunked(context, chat_id, text):
+            sent.append(text)
+
+        async def gen():
+            yield "before pause"
+            yield "still before pause"
+            await asyncio.sleep(0.3)
+            yield "after pause"
+
+        with patch("bot.send_chunked", side_effect=fake_send_chunked):
+            _, lines = await _stream_to_chat(ctx, 123, gen())
+
+        assert sent[-1] == "after pause"
+        assert "after pause" not in "\n".join(sent[:-1])
+        assert lines == ["before pause", "still before pause", "after pause"]
+
+    async def test_deploy_timeout_fires_while_streaming_to_chat(self, monkeypatch):
+        """Fix #17 must hold on the real path: a hung script is killed and
+        reported as failed, not streamed forever and reported as a success."""
+        await self._assert_hung_script_times_out(monkeypatch, "run_deployment")
+
+    async def test_rollback_timeout_fires_while_streaming_to_chat(self, monkeypatch):
+        await self._assert_hung_script_times_out(monkeypatch, "run_rollback")
+
+    async def test_deploy_timeout_fires_while_chat_send_is_slow(self, monkeypatch):
+        """The deadline may pass while the consumer is mid-send; a chatty
+        script must still be killed and reported, not cancel the handler."""
+        await self._assert_hung_script_times_out(monkeypatch, "run_deployment", chatty=True)
+
+    async def test_rollback_timeout_fires_while_chat_send_is_slow(self, monkeypatch):
+        await self._assert_hung_script_times_out(monkeypatch, "run_rollback", chatty=True)
+
+    @staticmethod
+    async def _assert_hung_script_times_out(monkeypatch, stream, chatty=False):
+        import asyncio
+        from config import Config
+        from deployment import DeploymentManager
+        monkeypatch.setattr(Config, "deploy_timeout_seconds", classmethod(lambda cls: 0.2))
+        monkeypatch.setattr(bot, "_FLUSH_INTERVAL", 0.05)
+        stdout = asyncio.StreamReader()
+        stdout.feed_data(b"start\n")  # ...then never reaches EOF
+
+        async def print_forever():
+            while True:
+                await asyncio.sleep(0.01)
+                stdout.feed_data(b"progress\n")
+
+        async def slow_send(*args):
+            await asyncio.sleep(0.1)
+
+        proc = MagicMock(stdout=stdout, returncode=None)
+        proc.wait = AsyncMock(return_value=-9)
+        manager = DeploymentManager()
+        args = ("staging", "abc1234") if stream == "run_deployment" else ("staging",)
+        printer = asyncio.create_task(print_forever()) if chatty else None
+
+        try:
+            with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=proc)), \
+                 patch("bot.send_chunked", side_effect=slow_send if chatty else None):
+                success, lines = await asyncio.wait_for(
+                    _stream_to_chat(make_context(), 123, getattr(manager, stream)(*args)),
+                    timeout=5,
+                )
+        finally:
+            if printer:
+                printer.cancel()
+
+        proc.kill.assert_called_once()
+        assert success is False
+        assert lines[0] == "start"
+        assert "timed out" in lines[-1]
+
     async def test_detects_error_line(self):
         """Any ERROR: line marks the result as failed."""
-        from bot import _stream_to_chat
         ctx = make_context()
 
         async def gen():
@@ -382,18 +441,72 @@ class TestStreamToChat:
 
 
 class TestErrorHandler:
-    @pytest.mark.asyncio
     async def test_error_handler_notifies_user(self):
-        from bot import error_handler
         update = make_update(user_id=111)
         context = make_context()
         context.error = ValueError("something broke")
         await error_handler(update, context)
         update.effective_message.reply_text.assert_awaited_once()
 
-    @pytest.mark.asyncio
     async def test_error_handler_handles_none_update(self):
-        from bot import error_handler
         context = make_context()
         context.error = ValueError("something broke")
         await error_handler(None, context)  # must not raise
+
+
+class TestSendChunked:
+    async def test_chunks_never_split_html_entities(self):
+        """Escaping happens before slicing, so no chunk may end mid-entity."""
+        ctx = make_context()
+        text = "x" + "&" * 5000
+        await send_chunked(ctx, 123, text)
+        bodies = [c.kwargs["text"][len("<pre>"):-len("</pre>")]
+                  for c in ctx.bot.send_message.call_args_list]
+        assert len(bodies) > 1
+        assert "".join(bodies) == "x" + "&amp;" * 5000
+        for body in bodies:
+            assert len(body) <= 4000
+            assert body.replace("&amp;", "").count("&") == 0
+
+    async def test_chunks_are_sent_without_artificial_delay(self):
+        """Pacing is the rate limiter's job, not send_chunked's."""
+        ctx = make_context()
+        with patch("bot.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            await send_chunked(ctx, 123, "x" * 9000)
+        assert ctx.bot.send_message.await_count == 3
+        mock_sleep.assert_not_awaited()
+
+    async def test_short_text_is_one_message(self):
+        ctx = make_context()
+        await send_chunked(ctx, 123, "a < b")
+        ctx.bot.send_message.assert_awaited_once()
+        assert ctx.bot.send_message.call_args.kwargs["text"] == "<pre>a &lt; b</pre>"
+
+
+class TestUtcNowStr:
+    def test_formats_current_second_and_reuses_it(self):
+        with patch("bot.time.time", return_value=0.2):
+            first = _utc_now_str()
+        with patch("bot.time.time", return_value=0.9), \
+             patch("bot.time.strftime") as mock_strftime:
+            assert _utc_now_str() is first
+        mock_strftime.assert_not_called()
+        assert first == "1970-01-01 00:00:00"
+        with patch("bot.time.time", return_value=61.0):
+            assert _utc_now_str() == "1970-01-01 00:01:01"
+
+
+class TestLogListener:
+    def test_root_handlers_run_behind_a_queue(self):
+        root = logging.getLogger()
+        original = root.handlers[:]
+        sink = MagicMock(spec=logging.Handler, level=logging.NOTSET)
+        root.handlers = [sink]
+        try:
+            listener = _start_log_listener()
+            assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+            logging.getLogger("bot").warning("queued")
+            listener.stop()
+            sink.handle.assert_called_once()
+        finally:
+            root.handlers = original
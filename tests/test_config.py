@@ -3,40 +3,35 @@ test_config.py - Tests for Config class
 All Config values are now lazy classmethods, so monkeypatch.setenv()
 works without any module reload.
 """
-import os
 import pytest
 
 
 class TestIdParsing:
-    def test_parses_single_admin_id(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "12345")
-        from config import Config
-        assert 12345 in Config.admin_ids()
-
-    def test_parses_multiple_admin_ids(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "111,222,333")
-        from config import Config
-        assert Config.admin_ids() == {111, 222, 333}
-
-    def test_ignores_whitespace_in_ids(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", " 111 , 222 , 333 ")
-        from config import Config
-        assert Config.admin_ids() == {111, 222, 333}
-
-    def test_ignores_empty_string(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "")
-        from config import Config
-        assert Config.admin_ids() == set()
-
-    def test_ignores_invalid_non_numeric_entries(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "111,abc,222,!@#")
-        from config import Config
-        assert Config.admin_ids() == {111, 222}
-
-    def test_ignores_negative_numbers(self, monkeypatch):
-        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "-111,222")
-        from config import Config
-        assert Config.admin_ids() == {222}
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("12345", {12345}),
+            ("111,222,333", {111, 222, 333}),
+            (" 111 , 222 , 333 ", {111, 222, 333}),
+            ("", set()),
+            ("111,abc,222,!@#", {111, 222}),
+            ("-111,222", {222}),
+            ("111,\u00b2,222", {111, 222}),  # '²' passes isdigit(), not int()
+        ],
+        ids=["single", "multiple", "whitespace", "empty", "invalid", "negative", "non-decimal"],
+    )
+    def test_parses_admin_ids(self, monkeypatch, raw, expected):
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", raw)
+        from config import Config
+        assert Config.admin_ids() == expected
+
+    def test_parsed_ids_are_reused_until_env_changes(self, monkeypatch):
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "111,222")
+        from config import Config
+        first = Config.admin_ids()
+        assert Config.admin_ids() is first
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "333")
+        assert Config.admin_ids() == {333}
 
 
 class TestRoleChecks:
@@ -69,6 +64,16 @@ class TestRoleChecks:
         assert 111 in all_staging
         assert 333 in all_staging
 
+    def test_staging_ids_reflect_admin_changes(self, monkeypatch):
+        """The cached union must be keyed on both env values."""
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "111")
+        monkeypatch.setenv("STAGING_TELEGRAM_IDS", "333")
+        from config import Config
+        first = Config.staging_ids()
+        assert Config.staging_ids() is first
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "222")
+        assert Config.staging_ids() == {222, 333}
+
     def test_empty_admin_list_means_no_admins(self, monkeypatch):
         monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "")
         from config import Config
@@ -107,6 +112,18 @@ class TestValidate:
         with pytest.raises(EnvironmentError, match="REGISTRY_URL"):
             Config.validate()
 
+    def test_validate_requires_secret_in_webhook_mode(self, monkeypatch):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token123")
+        monkeypatch.setenv("ADMIN_TELEGRAM_IDS", "111")
+        monkeypatch.setenv("REGISTRY_URL", "some-registry")
+        monkeypatch.setenv("WEBHOOK_URL", "https://bot.example.com/webhook/abc")
+        monkeypatch.setenv("WEBHOOK_SECRET", "")
+        from config import Config
+        with pytest.raises(EnvironmentError, match="WEBHOOK_SECRET"):
+            Config.validate()
+        monkeypatch.setenv("WEBHOOK_SECRET", "s3cret")
+        Config.validate()
+
 
 class TestGetTelegramBotToken:
     def test_returns_token_from_env(self, monkeypatch):
@@ -148,3 +165,9 @@ class TestGetTelegramBotToken:
         monkeypatch.setenv("DEPLOY_TIMEOUT_SECONDS", "300")
         from config import Config
         assert Config.deploy_timeout_seconds() == 300
+
+    def test_webhook_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("WEBHOOK_URL", raising=False)
+        from config import Config
+        assert Config.webhook_url() == ""
+        assert Config.webhook_port() == 8443
@@ -1,142 +1,214 @@
 """
 test_deployment.py - Tests for DeploymentManager
 """
+import asyncio
+import contextlib
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
 import pytest
-import subprocess
 from unittest.mock import AsyncMock, MagicMock, patch
-from deployment import DeploymentManager
 
+from config import Config
+from deployment import (
+    DeploymentManager,
+    _buffered_line_batches,
+    _read_line_batches,
+    _read_state_file,
+)
 
-@pytest.fixture
+
+# Canned script output shared by the streaming tests.
+_STEP_LINES = (b"Step 1\n", b"Step 2\n", b"Step 3\n")
+_DONE_LINES = (b"[INFO] Done\n",)
+
+
+@pytest.fixture(scope="module")
 def manager():
     return DeploymentManager()
 
 
+@pytest.fixture(autouse=True)
+async def _close_health_session(manager):
+    """The only per-test state on the shared manager is its aiohttp session,
+    which binds to the test's event loop, so close it after every test."""
+    yield
+    await manager.close()
+
+
+@pytest.fixture
+def subprocess_exec(monkeypatch):
+    """create_subprocess_exec as an AsyncMock; tests set return_value or side_effect."""
+    exec_mock = AsyncMock()
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", exec_mock)
+    return exec_mock
+
+
 class TestInputValidation:
-    @pytest.mark.asyncio
-    async def test_invalid_environment_raises_value_error(self, manager):
+    @pytest.mark.parametrize(
+        "env, commit",
+        [
+            ("invalid_env", "abc123"),
+            ("staging; rm -rf /", "abc123"),   # shell injection in environment
+            ("staging", "abc123; rm -rf /"),   # shell injection in commit
+        ],
+        ids=["unknown-env", "env-injection", "commit-injection"],
+    )
+    async def test_invalid_input_raises_value_error(self, manager, env, commit):
         # Fix #10: should raise ValueError, not AssertionError
         with pytest.raises(ValueError):
-            async for _ in manager.run_deployment("invalid_env", "abc123"):
-                pass
+            await manager.run_deployment(env, commit).__anext__()
 
-    @pytest.mark.asyncio
-    async def test_shell_injection_in_environment_is_blocked(self, manager):
+    async def test_rollback_rejects_invalid_environment(self, manager):
         with pytest.raises(ValueError):
-            async for _ in manager.run_deployment("staging; rm -rf /", "abc123"):
-                pass
+            await manager.run_rollback("staging; rm -rf /").__anext__()
 
-    @pytest.mark.asyncio
-    async def test_invalid_commit_hash_raises_value_error(self, manager):
-        # Fix #10: should raise ValueError, not AssertionError
+    @pytest.mark.parametrize("commit", ["abc", "ABC1234", "a" * 41, "abc123\n", "g123456"])
+    async def test_malformed_commit_hash_raises_value_error(self, manager, commit):
         with pytest.raises(ValueError):
-            async for _ in manager.run_deployment("staging", "abc123; rm -rf /"):
-                pass
-
-    @pytest.mark.asyncio
-    async def test_valid_staging_and_commit_pass_validation(self, manager):
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = _async_line_generator([b"[INFO] Done\n"])
-            proc.wait = AsyncMock(return_value=0)
-            proc.returncode = 0
-            mock_proc.return_value = proc
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
-            mock_proc.assert_called_once()
-
-    @pytest.mark.asyncio
-    async def test_unknown_commit_passes_validation(self, manager):
-        """'unknown' is a valid sentinel value."""
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = _async_line_generator([b"Done\n"])
-            proc.wait = AsyncMock(return_value=0)
-            proc.returncode = 0
-            mock_proc.return_value = proc
-            lines = []
-            async for line in manager.run_deployment("staging", "unknown"):
-                lines.append(line)
-            mock_proc.assert_called_once()
+            await manager.run_deployment("staging", commit).__anext__()
+
+    @pytest.mark.parametrize(
+        "env, commit",
+        [("staging", "abc1234"), ("production", "abc1234"), ("staging", "unknown")],
+        ids=["staging", "production", "unknown-sentinel"],
+    )
+    async def test_valid_input_passes_validation(self, manager, subprocess_exec, env, commit):
+        """'unknown' is a valid sentinel value for the commit."""
+        subprocess_exec.return_value = _fake_proc(_DONE_LINES)
+        async for _ in manager.run_deployment(env, commit):
+            pass
+        subprocess_exec.assert_called_once()
 
 
 class TestDeploymentStreaming:
-    @pytest.mark.asyncio
-    async def test_streams_stdout_lines(self, manager):
-        fake_output = [b"Step 1\n", b"Step 2\n", b"Step 3\n"]
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = _async_line_generator(fake_output)
-            proc.wait = AsyncMock(return_value=0)
-            proc.returncode = 0
-            mock_proc.return_value = proc
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
+    async def test_streams_stdout_lines(self, manager, subprocess_exec):
+        subprocess_exec.return_value = _fake_proc(_STEP_LINES)
+        lines = []
+        async for line in manager.run_deployment("staging", "abc1234"):
+            lines.append(line)
         assert lines == ["Step 1", "Step 2", "Step 3"]
 
-    @pytest.mark.asyncio
-    async def test_emits_error_line_on_nonzero_exit(self, manager):
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = _async_line_generator([b"Deploying...\n"])
-            proc.wait = AsyncMock(return_value=1)
-            proc.returncode = 1
-            mock_proc.return_value = proc
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
-        assert any("ERROR" in l for l in lines)
-
-    @pytest.mark.asyncio
-    async def test_emits_error_on_subprocess_exception(self, manager):
-        with patch("asyncio.create_subprocess_exec", side_effect=FileNotFoundError("script not found")):
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
-        assert any("ERROR" in l for l in lines)
-
-    @pytest.mark.asyncio
-    async def test_error_line_not_emitted_on_success(self, manager):
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = _async_line_generator([b"[INFO] All good\n"])
-            proc.wait = AsyncMock(return_value=0)
-            proc.returncode = 0
-            mock_proc.return_value = proc
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
-        assert not any(l.startswith("ERROR:") for l in lines)
-
-    @pytest.mark.asyncio
-    async def test_timeout_emits_error_and_kills_process(self, manager, monkeypatch):
-        """Fix #17: deployment subprocess must be killed on timeout."""
-        monkeypatch.setenv("DEPLOY_TIMEOUT_SECONDS", "1")
+    async def test_emits_error_line_on_nonzero_exit(self, manager, subprocess_exec):
+        subprocess_exec.return_value = _fake_proc([b"Deploying...\n"], rc=1)
+        assert await _any_line(manager.run_deployment("staging", "abc1234"), "ERROR")
 
-        async def slow_gen():
-            await asyncio.sleep(10)
-            yield b"never reached\n"
+    async def test_emits_error_on_subprocess_exception(self, manager, subprocess_exec):
+        subprocess_exec.side_effect = FileNotFoundError("script not found")
+        assert await _any_line(manager.run_deployment("staging", "abc1234"), "ERROR")
 
-        import asyncio as _asyncio
-        with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_proc:
-            proc = MagicMock()
-            proc.stdout = slow_gen()
-            proc.kill = MagicMock()
-            proc.wait = AsyncMock(return_value=None)
-            proc.returncode = -9
-            mock_proc.return_value = proc
+    async def test_error_line_not_emitted_on_success(self, manager, subprocess_exec):
+        subprocess_exec.return_value = _fake_proc([b"[INFO] All good\n"])
+        stream = manager.run_deployment("staging", "abc1234")
+        assert not await _any_line(stream, "ERROR:", prefix=True)
 
-            lines = []
-            async for line in manager.run_deployment("staging", "abc1234"):
-                lines.append(line)
+    async def test_timeout_emits_error_and_kills_process(self, manager, subprocess_exec, monkeypatch):
+        """Fix #17: deployment subprocess must be killed on timeout."""
+        monkeypatch.setenv("DEPLOY_TIMEOUT_SECONDS", "1")
+
+        proc = _FakeProc(stdout=asyncio.StreamReader(), returncode=-9)  # never produces output
+        subprocess_exec.return_value = proc
+        lines = []
+        async for line in manager.run_deployment("staging", "abc1234"):
+            lines.append(line)
 
         assert any("timed out" in l.lower() or "ERROR" in l for l in lines)
+        assert proc.killed == 1
+
+    async def test_closing_stream_early_terminates_and_reaps_script(self, manager, subprocess_exec):
+        """A consumer that stops reading must not leave deploy.sh running."""
+        # returncode None: still running when the consumer walks away
+        proc = _fake_proc(_STEP_LINES, rc=None)
+        subprocess_exec.return_value = proc
+        stream = manager.run_deployment("staging", "abc1234")
+        assert await stream.__anext__() == "Step 1"
+        await stream.aclose()
+
+        assert proc.terminated == 1
+        assert proc.waited >= 1
+
+    async def test_script_ignoring_sigterm_is_killed(self, manager, subprocess_exec, monkeypatch):
+        """A deploy.sh that traps SIGTERM must not wedge the generator's finally."""
+        import deployment
+        monkeypatch.setattr(deployment, "_REAP_GRACE", 0.05)
+        proc = _StubbornProc(stdout=_async_line_generator(_STEP_LINES), returncode=None)
+        subprocess_exec.return_value = proc
+        stream = manager.run_deployment("staging", "abc1234")
+        assert await stream.__anext__() == "Step 1"
+        await asyncio.wait_for(stream.aclose(), timeout=5)
+
+        assert proc.terminated == 1
+        assert proc.killed == 1
+
+    async def test_finished_script_is_not_terminated(self, manager, subprocess_exec):
+        proc = _fake_proc(_DONE_LINES)
+        subprocess_exec.return_value = proc
+        async for _ in manager.run_rollback("staging"):
+            pass
+        assert proc.terminated == 0
+
+    async def test_partial_and_oversized_lines_are_reassembled(self, manager):
+        """Lines split across reads, longer than 64 KiB, or unterminated all survive."""
+        reader = asyncio.StreamReader()
+        long_line = b"x" * 200_000
+        reader.feed_data(b"Step 1\nSte")
+        reader.feed_data(b"p 2\n" + long_line + b"\ntail")
+        reader.feed_eof()
+        lines = [line async for batch in _read_line_batches(reader) for line in batch]
+        assert lines == ["Step 1", "Step 2", long_line.decode(), "tail"]
+
+    async def test_output_without_newlines_is_emitted_in_bounded_lines(self, monkeypatch):
+        """A \n-free stream must not accumulate without limit (or quadratically)."""
+        import deployment
+        monkeypatch.setattr(deployment, "_MAX_PENDING", 1000)
+        chunks = [b"#" * 100] * 50 + [b"#" * 50 + b"\ndone\n"]
+        reader = MagicMock()
+        reader.read = AsyncMock(side_effect=chunks + [b""])  # one chunk per read
+        lines = [line async for batch in _read_line_batches(reader) for line in batch]
+        assert lines[-1] == "done"
+        assert all(len(line) <= 1000 for line in lines)
+        assert "".join(lines[:-1]) == "#" * 5050
+
+    async def test_only_newline_splits_lines(self):
+        """A \r-redrawn progress bar is one line, and a fragment after \r
+        starting with ERROR: is not a line of its own."""
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"10%\r50%\rERROR: retrying\r100%\n\nform\x0cfeed\n")
+        reader.feed_eof()
+        lines = [line async for batch in _read_line_batches(reader) for line in batch]
+        assert lines == ["10%\r50%\rERROR: retrying\r100%", "", "form\x0cfeed"]
+
+    async def test_crlf_and_split_multibyte_chars_decode_cleanly(self):
+        reader = asyncio.StreamReader()
+        snowman = "☃".encode()
+        reader.feed_data(b"win\r\nsnow " + snowman[:1])
+        batches = _read_line_batches(reader)
+        assert await batches.__anext__() == ["win"]
+        reader.feed_data(snowman[1:] + b"\n")  # character completes in the next read
+        reader.feed_eof()
+        assert [line async for batch in batches for line in batch] == ["snow ☃"]
+
+    async def test_stdout_is_drained_while_consumer_is_busy(self):
+        """The reader task keeps emptying the pipe between consumer steps."""
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"a\n")
+        batches = _buffered_line_batches(reader)
+        assert await batches.__anext__() == ["a"]
+
+        reader.feed_data(b"b\n")
+        reader.feed_data(b"c\n")
+        reader.feed_eof()
+        for _ in range(5):
+            await asyncio.sleep(0)  # consumer "busy"; only the reader runs
+        assert reader.at_eof()
+
+        rest = [line async for batch in batches for line in batch]
+        assert rest == ["b", "c"]
 
 
 class TestConcurrentHealthChecks:
-    @pytest.mark.asyncio
     async def test_get_status_checks_both_envs_concurrently(self, manager):
         """Fix #2: both health checks must run, regardless of individual failures."""
         check_calls = []
@@ -154,69 +226,108 @@ class TestConcurrentHealthChecks:
         assert result["staging"]["healthy"] is True
         assert result["production"]["healthy"] is False
 
+    async def test_get_status_survives_one_check_raising(self, manager):
+        async def fake_check(session, url):
+            if "production" in url:
+                raise RuntimeError("boom")
+            return True
 
-class TestHealthCheck:
-    @pytest.mark.asyncio
-    async def test_returns_true_on_http_200(self, manager):
-        mock_resp = AsyncMock()
-        mock_resp.status = 200
-        mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
-        mock_resp.__aexit__ = AsyncMock(return_value=False)
-        mock_session = MagicMock()
-        mock_session.get = MagicMock(return_value=mock_resp)
-        result = await manager._check_health(mock_session, "http://example.com/health")
-        assert result is True
+        with patch.object(manager, "_check_health", side_effect=fake_check), \
+             patch.object(manager, "_get_deployed_commit", return_value="abc123"), \
+             patch.object(manager, "_get_deployed_at", return_value="never"):
+            result = await manager.get_status()
+
+        assert result["staging"]["healthy"] is True
+        assert result["production"]["healthy"] is False
+
+    async def test_get_status_reuses_one_session_until_closed(self, manager):
+        sessions = []
+
+        async def fake_check(session, url):
+            sessions.append(session)
+            return True
+
+        with patch.object(manager, "_check_health", side_effect=fake_check), \
+             patch.object(manager, "_get_deployed_commit", return_value="abc123"), \
+             patch.object(manager, "_get_deployed_at", return_value="never"):
+            await manager.get_status()
+            await manager.get_status()
+            first = sessions[0]
+            assert all(s is first for s in sessions)
+            await manager.close()
+            assert first.closed
+            await manager.get_status()
+        assert sessions[-1] is not first
+        await manager.close()
 
-    @pytest.mark.asyncio
-    async def test_returns_false_on_http_500(self, manager):
+
+class TestHealthCheck:
+    @staticmethod
+    def _resp(status):
         mock_resp = AsyncMock()
-        mock_resp.status = 500
+        mock_resp.status = status
         mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
         mock_resp.__aexit__ = AsyncMock(return_value=False)
+        return mock_resp
+
+    @pytest.mark.parametrize(
+        "head_status, get_status, expected",
+        [
+            (200, None, True),
+            (500, None, False),
+            (405, 200, True),    # HEAD not allowed → falls back to GET
+            (501, 503, False),
+        ],
+        ids=["head-200", "head-500", "head-405-get-200", "head-501-get-503"],
+    )
+    async def test_health_status(self, manager, head_status, get_status, expected):
         mock_session = MagicMock()
-        mock_session.get = MagicMock(return_value=mock_resp)
+        mock_session.head = MagicMock(return_value=self._resp(head_status))
+        if get_status is not None:
+            mock_session.get = MagicMock(return_value=self._resp(get_status))
         result = await manager._check_health(mock_session, "http://example.com/health")
-        assert result is False
+        assert result is expected
+        if get_status is None:
+            mock_session.get.assert_not_called()
 
-    @pytest.mark.asyncio
     async def test_returns_false_on_connection_error(self, manager):
-        import aiohttp
         mock_session = MagicMock()
-        mock_session.get = MagicMock(side_effect=aiohttp.ClientConnectionError())
+        mock_session.head = MagicMock(side_effect=aiohttp.ClientConnectionError())
         result = await manager._check_health(mock_session, "http://unreachable.local/health")
         assert result is False
 
 
+_SAFE_ENV_REQUIRED_KEYS = (
+    "HOME", "PATH", "REGISTRY_URL", "REGISTRY_IMAGE",
+    "STAGING_HOST", "PRODUCTION_HOST", "DEPLOY_USER",
+    "SSH_KEY_PATH", "KUBE_NAMESPACE", "USE_KUBERNETES",
+    "AWS_REGION",
+)
+
+
+@pytest.fixture
+def safe_env(manager):
+    # Function-scoped on purpose: a wider scope would be built before the
+    # autouse set_env fixture runs and would snapshot the wrong environment.
+    return manager._safe_env()
+
+
 class TestSafeEnv:
-    def test_safe_env_contains_required_keys(self, manager):
-        env = manager._safe_env()
-        required_keys = [
-            "HOME", "PATH", "REGISTRY_URL", "REGISTRY_IMAGE",
-            "STAGING_HOST", "PRODUCTION_HOST", "DEPLOY_USER",
-            "SSH_KEY_PATH", "KUBE_NAMESPACE", "USE_KUBERNETES",
-            "AWS_REGION",
-        ]
-        for key in required_keys:
-            assert key in env, f"Missing key in safe_env: {key}"
-
-    def test_safe_env_home_is_not_root(self, manager):
-        """Fix #8: HOME must not be /root when running as non-root botuser."""
-        env = manager._safe_env()
-        assert env["HOME"] != "/root", "HOME should be /home/botuser, not /root"
-        assert env["HOME"] == "/home/botuser"
+    def test_safe_env_contains_required_keys(self, safe_env):
+        for key in _SAFE_ENV_REQUIRED_KEYS:
+            assert key in safe_env, f"Missing key in safe_env: {key}"
 
-    def test_safe_env_does_not_contain_telegram_token(self, manager):
-        env = manager._safe_env()
-        assert "TELEGRAM_BOT_TOKEN" not in env
+    def test_safe_env_home_is_not_root(self, safe_env):
+        """Fix #8: HOME must not be /root when running as non-root botuser."""
+        assert safe_env["HOME"] != "/root", "HOME should be /home/botuser, not /root"
+        assert safe_env["HOME"] == "/home/botuser"
 
-    def test_safe_env_does_not_contain_github_token(self, manager):
-        env = manager._safe_env()
-        assert "GITHUB_TOKEN" not in env
+    @pytest.mark.parametrize("secret", ["TELEGRAM_BOT_TOKEN", "GITHUB_TOKEN"])
+    def test_safe_env_does_not_contain_secrets(self, safe_env, secret):
+        assert secret not in safe_env
 
-    def test_safe_env_aws_region_matches_config(self, manager):
-        env = manager._safe_env()
-        from config import Config
-        assert env["AWS_REGION"] == Config.aws_region()
+    def test_safe_env_aws_region_matches_config(self, safe_env):
+        assert safe_env["AWS_REGION"] == Config.aws_region()
 
     def test_safe_env_values_are_lazy(self, manager, monkeypatch):
         """Fix #1: safe_env must return current env values, not import-time snapshots."""
@@ -226,41 +337,147 @@ class TestSafeEnv:
 
 
 class TestStateFiles:
-    def test_get_deployed_commit_returns_unknown_when_missing(self, manager):
-        assert manager._get_deployed_commit("staging") == "unknown"
+    async def test_get_deployed_commit_returns_unknown_when_missing(self, manager):
+        assert await manager._get_deployed_commit("staging") == "unknown"
 
-    def test_get_deployed_at_returns_never_when_missing(self, manager):
-        assert manager._get_deployed_at("production") == "never"
+    async def test_get_deployed_at_returns_never_when_missing(self, manager):
+        assert await manager._get_deployed_at("production") == "never"
+
+    async def test_state_file_is_read_off_the_loop_thread(self, manager):
+        reader_threads = []
+
+        def recording_read(path, default):
+            reader_threads.append(threading.get_ident())
+            return _read_state_file(path, default)
+
+        with patch("deployment._read_state_file", side_effect=recording_read):
+            await manager._get_deployed_commit("staging")
+        assert reader_threads and threading.get_ident() not in reader_threads
+
+    def test_read_state_file_strips_contents(self, tmp_path):
+        path = tmp_path / "staging.commit"
+        path.write_text("abc1234\n")
+        assert _read_state_file(str(path), "unknown") == "abc1234"
+
+
+@pytest.fixture
+def git_returns(subprocess_exec):
+    """Make the next git call print `stdout` and exit with `returncode`.
+    Returns the create_subprocess_exec mock so tests can inspect argv."""
+    def _set(stdout: bytes, returncode: int = 0):
+        proc = MagicMock()
+        proc.communicate = AsyncMock(return_value=(stdout, b""))
+        proc.returncode = returncode
+        subprocess_exec.return_value = proc
+        return subprocess_exec
+    return _set
+
+
+@pytest.fixture
+def git_missing(subprocess_exec):
+    subprocess_exec.side_effect = FileNotFoundError("git")
 
 
 class TestGitHelpers:
-    def test_get_latest_commit_returns_unknown_on_error(self, manager):
-        with patch("subprocess.run", side_effect=subprocess.CalledProcessError(1, "git")):
-            result = manager.get_latest_commit()
-        assert result == "unknown"
-
-    def test_get_latest_commit_strips_whitespace(self, manager):
-        mock_result = MagicMock()
-        mock_result.stdout = "abc1234\n"
-        with patch("subprocess.run", return_value=mock_result):
-            result = manager.get_latest_commit()
-        assert result == "abc1234"
-
-    def test_get_latest_commit_uses_branch_when_provided(self, manager):
+    @pytest.mark.parametrize(
+        "stdout, returncode, branch",
+        [
+            (b"", 128, None),      # rev-parse fails
+            (b"", 128, "main"),    # ls-remote fails
+            (b"", 0, "nope"),      # ls-remote finds no such branch
+        ],
+        ids=["rev-parse-error", "ls-remote-error", "missing-remote-branch"],
+    )
+    async def test_get_latest_commit_returns_unknown_on_failure(
+        self, manager, git_returns, stdout, returncode, branch
+    ):
+        git_returns(stdout, returncode=returncode)
+        assert await manager.get_latest_commit(branch=branch) == "unknown"
+
+    async def test_get_latest_commit_returns_unknown_when_git_missing(self, manager, git_missing):
+        assert await manager.get_latest_commit() == "unknown"
+
+    async def test_get_latest_commit_strips_whitespace(self, manager, git_returns):
+        git_returns(b"abc1234\n")
+        assert await manager.get_latest_commit() == "abc1234"
+
+    async def test_get_latest_commit_uses_branch_when_provided(self, manager, git_returns):
         """Branch parameter must be passed to git command."""
-        mock_result = MagicMock()
-        mock_result.stdout = "def5678\n"
-        with patch("subprocess.run", return_value=mock_result) as mock_run:
-            manager.get_latest_commit(branch="main")
-        call_args = mock_run.call_args[0][0]
+        mock_exec = git_returns(b"def5678\n")
+        await manager.get_latest_commit(branch="main")
+        call_args = mock_exec.call_args[0]
         assert any("main" in str(arg) for arg in call_args)
 
+    async def test_branch_tip_is_read_from_remote(self, manager, git_returns):
+        mock_exec = git_returns(b"def5678a9b0c1d2e3f4a5b6c7d8e9f0a1b2c3d4e\trefs/heads/main\n")
+        assert await manager.get_latest_commit(branch="main") == "def5678"
+        assert mock_exec.call_args[0][:3] == ("git", "ls-remote", "--quiet")
 
-import asyncio
+    async def test_get_latest_commit_kills_hung_git(self, manager, subprocess_exec, monkeypatch):
+        """An unreachable remote must not hang ls-remote forever."""
+        import deployment
+        monkeypatch.setattr(deployment, "_GIT_TIMEOUT", 0.05)
+        async def never_returns():
+            await asyncio.Event().wait()
+
+        proc = MagicMock()
+        proc.communicate = never_returns
+        proc.wait = AsyncMock(return_value=-9)
+        subprocess_exec.return_value = proc
+        assert await manager.get_latest_commit(branch="main") == "unknown"
+        proc.kill.assert_called_once()
+        proc.wait.assert_awaited_once()
 
-async def _async_line_gen(lines):
-    for line in lines:
-        yield line
 
 def _async_line_generator(lines):
-    return _async_line_gen(lines)
+    """A real StreamReader pre-loaded with the given output and EOF."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(lines))
+    reader.feed_eof()
+    return reader
+
+
+async def _any_line(stream, needle, prefix=False):
+    """True as soon as a streamed line contains (or starts with) needle;
+    the rest of the stream is not read."""
+    async with contextlib.aclosing(stream):
+        async for line in stream:
+            if line.startswith(needle) if prefix else needle in line:
+                return True
+    return False
+
+
+@dataclass(slots=True)
+class _FakeProc:
+    """Just the Process surface run_deployment/run_rollback touch, with call counts."""
+    stdout: asyncio.StreamReader
+    returncode: Optional[int] = 0
+    terminated: int = 0
+    killed: int = 0
+    waited: int = 0
+
+    def terminate(self) -> None:
+        self.terminated += 1
+
+    def kill(self) -> None:
+        self.killed += 1
+
+    async def wait(self) -> Optional[int]:
+        self.waited += 1
+        return self.returncode
+
+
+@dataclass(slots=True)
+class _StubbornProc(_FakeProc):
+    """A _FakeProc that traps SIGTERM: wait() only returns once killed."""
+
+    async def wait(self) -> Optional[int]:
+        self.waited += 1
+        while not self.killed:
+            await asyncio.sleep(0.01)
+        return self.returncode
+
+
+def _fake_proc(lines, rc=0):
+    """A finished deploy/rollback process that printed `lines` and exited with rc."""
+    return _FakeProc(stdout=_async_line_generator(lines), returncode=rc)
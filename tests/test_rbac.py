@@ -1,106 +1,98 @@
 """test_rbac.py - Tests for the @require_role decorator"""
+import functools
+
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
-from conftest import make_update, make_context
+from telegram.constants import ParseMode
+from conftest import make_context, last_text
+from rbac import Role, require_role
+
 
+# Calls recorded by the cached dummy handlers, cleared before every test.
+_CALLED = {role: [] for role in Role}
 
+
+@functools.lru_cache(maxsize=None)
 def _make_handler(role):
-    from rbac import require_role
-    called = []
+    """One decorated dummy handler per role, built on first use."""
+    called = _CALLED[role]
     @require_role(role)
     async def dummy_handler(update, context):
         called.append(True)
     return dummy_handler, called
 
 
-class TestAdminRole:
-    @pytest.mark.asyncio
-    async def test_admin_user_can_call_admin_handler(self):
-        from rbac import Role
-        handler, called = _make_handler(Role.ADMIN)
-        update = make_update(user_id=111)
-        with patch("rbac.Config.is_admin", return_value=True):
-            await handler(update, make_context())
-        assert called
-
-    @pytest.mark.asyncio
-    async def test_staging_user_blocked_from_admin_handler(self):
-        from rbac import Role
-        handler, called = _make_handler(Role.ADMIN)
-        update = make_update(user_id=333)
-        with patch("rbac.Config.is_admin", return_value=False):
-            await handler(update, make_context())
-        assert not called
-        update.effective_message.reply_text.assert_awaited_once()
+@pytest.fixture(autouse=True)
+def _reset_called():
+    for calls in _CALLED.values():
+        calls.clear()
+
+
+@pytest.fixture(scope="module")
+def rbac_ctx():
+    """require_role never reads or writes the context, so one serves the module."""
+    return make_context()
+
 
-    @pytest.mark.asyncio
-    async def test_denial_message_uses_html_parse_mode(self):
+class TestRoleGate:
+    @pytest.mark.parametrize(
+        "role, as_user, granted, update_fixture",
+        [
+            (Role.ADMIN, "as_admin", True, "admin_update"),
+            (Role.ADMIN, "as_staging_user", False, "staging_update"),
+            (Role.STAGING, "as_staging_user", True, "staging_update"),
+            (Role.STAGING, "as_unauthorized", False, "unauthorized_update"),
+        ],
+        ids=["admin-allowed", "staging-blocked-from-admin", "staging-allowed", "unknown-blocked"],
+    )
+    async def test_handler_runs_only_when_role_granted(
+        self, request, rbac_ctx, role, as_user, granted, update_fixture
+    ):
+        request.getfixturevalue(as_user)
+        update = request.getfixturevalue(update_fixture)
+        handler, called = _make_handler(role)
+        await handler(update, rbac_ctx)
+        assert bool(called) is granted
+        if not granted:
+            update.effective_message.reply_text.assert_awaited_once()
+
+    async def test_denial_message_uses_html_parse_mode(
+        self, rbac_ctx, unauthorized_update, as_unauthorized
+    ):
         """Fix #9: denial message must use HTML parse mode, not bare backticks."""
-        from rbac import Role
-        from telegram.constants import ParseMode
         handler, _ = _make_handler(Role.ADMIN)
-        update = make_update(user_id=999)
-        with patch("rbac.Config.is_admin", return_value=False):
-            await handler(update, make_context())
+        update = unauthorized_update
+        await handler(update, rbac_ctx)
         call_kwargs = update.effective_message.reply_text.call_args[1]
         assert call_kwargs.get("parse_mode") == ParseMode.HTML
 
-    @pytest.mark.asyncio
-    async def test_denial_message_uses_code_tags_not_backticks(self):
+    async def test_denial_message_uses_code_tags_not_backticks(
+        self, rbac_ctx, unauthorized_update, as_unauthorized
+    ):
         """Fix #9: role name must be in <code> tags, not backtick markdown."""
-        from rbac import Role
         handler, _ = _make_handler(Role.ADMIN)
-        update = make_update(user_id=999)
-        with patch("rbac.Config.is_admin", return_value=False):
-            await handler(update, make_context())
-        msg = update.effective_message.reply_text.call_args[0][0]
+        update = unauthorized_update
+        await handler(update, rbac_ctx)
+        msg = last_text(update.effective_message.reply_text)
         assert "<code>" in msg
         assert "`" not in msg
 
 
-class TestStagingRole:
-    @pytest.mark.asyncio
-    async def test_staging_user_can_call_staging_handler(self):
-        from rbac import Role
-        handler, called = _make_handler(Role.STAGING)
-        update = make_update(user_id=333)
-        with patch("rbac.Config.is_authorized", return_value=True):
-            await handler(update, make_context())
-        assert called
-
-    @pytest.mark.asyncio
-    async def test_unknown_user_blocked_from_staging_handler(self):
-        from rbac import Role
-        handler, called = _make_handler(Role.STAGING)
-        update = make_update(user_id=999)
-        with patch("rbac.Config.is_authorized", return_value=False):
-            await handler(update, make_context())
-        assert not called
-
-
 class TestRbacEdgeCases:
-    @pytest.mark.asyncio
-    async def test_none_user_is_silently_ignored(self):
-        from rbac import Role
+    async def test_none_user_is_silently_ignored(self, rbac_ctx, staging_update):
         handler, called = _make_handler(Role.STAGING)
-        update = make_update(user_id=333)
+        update = staging_update
         update.effective_user = None
-        await handler(update, make_context())
+        await handler(update, rbac_ctx)
         assert not called
 
-    @pytest.mark.asyncio
-    async def test_decorator_preserves_function_name(self):
-        from rbac import require_role, Role
+    def test_decorator_preserves_function_name(self):
         @require_role(Role.STAGING)
         async def my_special_handler(update, context):
             pass
         assert my_special_handler.__name__ == "my_special_handler"
 
-    @pytest.mark.asyncio
-    async def test_denial_reply_is_sent_once(self):
-        from rbac import Role
+    async def test_denial_reply_is_sent_once(self, rbac_ctx, unauthorized_update, as_unauthorized):
         handler, _ = _make_handler(Role.STAGING)
-        update = make_update(user_id=999)
-        with patch("rbac.Config.is_authorized", return_value=False):
-            await handler(update, make_context())
+        update = unauthorized_update
+        await handler(update, rbac_ctx)
         assert update.effective_message.reply_text.await_count == 1